@@ -0,0 +1,134 @@
+"""
+Benchmark da suavização gaussiana
+
+Compara o backend de referência ('skimage', um canal por vez em float64)
+com os backends fundidos do OpenCV ('float32' e 'uint8') em 512², 2K e 8K,
+informando tempo mediano, speedup e diferença máxima em relação à referência.
+
+Em seguida confere a tolerância documentada de cada backend
+(processamento.GAUSSIAN_TOLERANCES) em uma faixa de σ, sobre a imagem
+sintética 512² e as imagens de exemplo (../imagens, resolução original):
+diferença máxima e fração de pixels diferentes acima do documentado contam
+como falha e o código de saída é 1.
+
+Execução:
+python benchmarks/bench_gaussian.py
+python benchmarks/bench_gaussian.py --sigma 2.0 --repeticoes 3
+python benchmarks/bench_gaussian.py --resolucoes 512² --amostras 0
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import processamento as proc
+
+RESOLUTIONS = {
+    '512²': (512, 512),
+    '2K': (1080, 2048),
+    '8K': (4320, 7680),
+}
+BACKENDS = ['skimage', 'float32', 'uint8']
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'imagens')
+
+# σ conferidos contra a tolerância (cobre todas as faixas de GAUSSIAN_TOLERANCES)
+TOLERANCE_SIGMAS = (0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0)
+
+
+def synthetic_image(height, width, seed=0):
+    """Imagem RGB sintética com gradientes, bordas e ruído"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 // max(width - 1, 1),
+                     y * 255 // max(height - 1, 1),
+                     ((x // 32 + y // 32) % 2) * 255], axis=2)
+    noise = rng.integers(-20, 21, size=base.shape)
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+
+def sample_images(count):
+    """Até count imagens de exemplo (nome, RGB uint8), em ordem de nome"""
+    paths = sorted(glob.glob(os.path.join(IMAGES_DIR, '*.jpg')))[:count]
+    images = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            images.append((os.path.basename(path), proc.decode_image(f.read())))
+    return images
+
+
+def check_tolerance(images, sigmas):
+    """Confere os backends contra a tolerância documentada; retorna as falhas"""
+    failures = []
+    print(f"\n{'Imagem':<16} {'σ':>5} {'Backend':<8} {'Dif. máx.':>10} {'% pixels':>9} {'Limite':>14}")
+    for label, img in images:
+        for sigma in sigmas:
+            reference = proc.gaussian_blur(img, sigma, backend='skimage')
+            for backend in proc.GAUSSIAN_TOLERANCES:
+                diff = np.abs(proc.gaussian_blur(img, sigma, backend=backend).astype(np.int16) - reference)
+                max_diff, fraction = int(diff.max()), float(np.count_nonzero(diff)) / diff.size
+                limit_diff, limit_fraction = proc.gaussian_tolerance(backend, sigma)
+                ok = max_diff <= limit_diff and fraction <= limit_fraction
+                print(f"{label:<16} {sigma:>5} {backend:<8} {max_diff:>10} {fraction:>9.3%} "
+                      f"{f'{limit_diff} / {limit_fraction:.1%}':>14} {'✅' if ok else '❌'}")
+                if not ok:
+                    failures.append(f"{label} σ={sigma} {backend}: diferença {max_diff}, "
+                                    f"{fraction:.3%} dos pixels")
+    return failures
+
+
+def median_time(func, repeats):
+    """Tempo mediano (s) de func em repeats execuções"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def main(argv=None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Benchmark da suavização gaussiana")
+    parser.add_argument('--sigma', type=float, default=1.0)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--resolucoes', nargs='+', choices=list(RESOLUTIONS),
+                        default=list(RESOLUTIONS))
+    parser.add_argument('--amostras', type=int, default=2,
+                        help="Imagens de exemplo de ../imagens na conferência da tolerância (0 = nenhuma)")
+    args = parser.parse_args(argv)
+
+    print(f"σ={args.sigma}, {args.repeticoes} repetições (tempo mediano)")
+    print(f"{'Resolução':<10} {'Backend':<8} {'Tempo (ms)':>11} {'Speedup':>8} {'Dif. máx.':>10}")
+
+    for label in args.resolucoes:
+        img = synthetic_image(*RESOLUTIONS[label])
+        reference = proc.gaussian_blur(img, args.sigma, backend='skimage')
+        base_time = None
+        for backend in BACKENDS:
+            t = median_time(lambda: proc.gaussian_blur(img, args.sigma, backend=backend),
+                            args.repeticoes)
+            out = proc.gaussian_blur(img, args.sigma, backend=backend)
+            diff = int(np.abs(out.astype(np.int16) - reference).max())
+            base_time = base_time or t
+            print(f"{label:<10} {backend:<8} {t * 1000:>11.1f} {base_time / t:>7.1f}x {diff:>10}")
+
+    images = [('512²', synthetic_image(*RESOLUTIONS['512²']))] + sample_images(args.amostras)
+    failures = check_tolerance(images, TOLERANCE_SIGMAS)
+    if failures:
+        print(f"\n❌ {len(failures)} resultado(s) fora da tolerância documentada:")
+        for message in failures:
+            print(f"   {message}")
+        return 1
+    print("\n✅ Backends dentro da tolerância documentada")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
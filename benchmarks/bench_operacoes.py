@@ -0,0 +1,259 @@
+"""
+Benchmark de todas as operações de processamento
+
+Mede pré-processamento (Gaussiano/Mediana), nitidez (Laplaciano/Sobel/Alta
+Frequência), contraste (CLAHE/Equalização Global), pipeline híbrido,
+métricas e relatório PDF sobre imagens sintéticas fixas (512², 2K, 8K) e
+sobre as imagens de exemplo (../imagens, resolução original). Para cada par
+operação × imagem registra o tempo mediano, a vazão (megapixels por
+segundo) e o pico de memória alocada (tracemalloc, em uma execução extra
+fora da medição de tempo; inclui os arrays NumPy/OpenCV devolvidos e
+temporários, não os buffers internos do OpenCV).
+
+Cada operação roda uma vez antes da medição (importações tardias, como a
+do reportlab, ficam fora do tempo). O cache de artefatos é esvaziado antes
+de cada execução, então cada medida inclui tons de cinza, gradientes e
+bordas, como na primeira vez que uma imagem é processada. Métricas e
+relatório recebem a saída do pipeline híbrido, calculada fora da medição.
+
+Os resultados vão para um arquivo JSON (--saida). Com --comparar, cada
+medida é comparada à de um arquivo de base gerado antes; tempo ou memória
+acima da base mais a tolerância contam como regressão e o código de saída
+é 1.
+
+Execução:
+python benchmarks/bench_operacoes.py --saida base.json
+python benchmarks/bench_operacoes.py --comparar base.json --tolerancia 0.15
+python benchmarks/bench_operacoes.py --resolucoes 512² --amostras 0 --operacoes nitidez
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import artefatos
+import processamento as proc
+from relatorio import build_pdf_report
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'imagens')
+
+RESOLUTIONS = {
+    '512²': (512, 512),
+    '2K': (1080, 2048),
+    '8K': (4320, 7680),
+}
+
+RESULTS_VERSION = 1
+
+# Tolerância padrão da comparação (fração acima da base)
+DEFAULT_TOLERANCE = 0.15
+
+# Folga absoluta do pico de memória (MiB), para imagens pequenas
+MEMORY_SLACK_MIB = 1.0
+
+P = proc.DEFAULT_PARAMS
+
+
+def synthetic_image(height, width, seed=0):
+    """Imagem RGB sintética com gradientes, bordas e ruído"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 // max(width - 1, 1),
+                     y * 255 // max(height - 1, 1),
+                     ((x // 32 + y // 32) % 2) * 255], axis=2)
+    noise = rng.integers(-20, 21, size=base.shape)
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+
+def sample_images(count):
+    """Até count imagens de exemplo (nome, RGB uint8), em ordem de nome"""
+    paths = sorted(glob.glob(os.path.join(IMAGES_DIR, '*.jpg')))[:count]
+    images = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            images.append((os.path.basename(path), proc.decode_image(f.read())))
+    return images
+
+
+def _hybrid(img):
+    return proc.hybrid_pipeline(img, True, P['hybrid_sigma'], True, P['hybrid_clip'],
+                                P['hybrid_tile'], True, P['hybrid_sharp_method'],
+                                P['hybrid_weight'], P['hybrid_intensity'])[0]
+
+
+# Operação -> função (imagem, processada, métricas) -> resultado
+OPERATIONS = {
+    'pré-processamento Gaussiano': lambda img, out, m: proc.preprocess(
+        img, 'Gaussiano', P['kernel_radius'], P['sigma']),
+    'pré-processamento Mediana': lambda img, out, m: proc.preprocess(
+        img, 'Mediana', P['kernel_radius'], P['sigma']),
+    'nitidez Laplaciano': lambda img, out, m: proc.sharpen(
+        img, 'Laplaciano', P['weight'], P['threshold'], P['intensity']),
+    'nitidez Sobel': lambda img, out, m: proc.sharpen(
+        img, 'Sobel', P['weight'], P['threshold'], P['intensity']),
+    'nitidez Alta Frequência': lambda img, out, m: proc.sharpen(
+        img, 'Alta Frequência', P['weight'], P['threshold'], P['intensity']),
+    'contraste CLAHE': lambda img, out, m: proc.enhance_contrast(
+        img, 'CLAHE (Local)', P['clip_limit'], P['tile_size']),
+    'contraste Global': lambda img, out, m: proc.enhance_contrast(
+        img, 'Equalização Global', P['clip_limit'], P['tile_size']),
+    'híbrido': lambda img, out, m: _hybrid(img),
+    'métricas': lambda img, out, m: proc.compute_metrics(img, out),
+    'relatório PDF': lambda img, out, m: build_pdf_report(
+        img, out, m, [f"[2024-01-01 00:00:00] Operação {i}" for i in range(30)], 'benchmark',
+        generated_at=datetime(2024, 1, 1)),
+}
+
+
+def measure(func, repeats):
+    """(tempo mediano em s, pico de memória em bytes) de func, sem artefatos em cache"""
+    # Aquecimento fora da medição (importações tardias, inicialização do OpenCV)
+    func()
+    times = []
+    for _ in range(repeats):
+        artefatos.ARTIFACTS.clear()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    artefatos.ARTIFACTS.clear()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    artefatos.ARTIFACTS.clear()
+    return float(np.median(times)), peak
+
+
+def run(images, operations, repeats):
+    """Lista de resultados (um dicionário por operação × imagem)"""
+    results = []
+    for label, img in images:
+        processed = _hybrid(img)
+        metrics = proc.compute_metrics(img, processed, mode='reduzido')
+        h, w = img.shape[:2]
+        megapixels = h * w / 1e6
+        for name in operations:
+            func = OPERATIONS[name]
+            t, peak = measure(lambda: func(img, processed, metrics), repeats)
+            results.append({
+                'operacao': name,
+                'imagem': label,
+                'largura': w,
+                'altura': h,
+                'tempo_ms': t * 1000,
+                'mp_s': megapixels / t,
+                'pico_mib': peak / 2 ** 20,
+                'repeticoes': repeats
+            })
+            print(f"{name:<28} {label:<14} {w}×{h:<7} {t * 1000:>10.1f} "
+                  f"{megapixels / t:>9.1f} {peak / 2 ** 20:>10.1f}")
+    return results
+
+
+def environment():
+    """Versões e máquina em que o benchmark rodou"""
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Regressões de tempo e de memória em relação à base; retorna a lista de mensagens"""
+    base = {(r['operacao'], r['imagem']): r for r in baseline['resultados']}
+    regressions = []
+    print(f"\n{'Operação':<28} {'Imagem':<14} {'Tempo':>9} {'Memória':>9}")
+    for r in results:
+        b = base.get((r['operacao'], r['imagem']))
+        if b is None:
+            continue
+        time_ratio = r['tempo_ms'] / b['tempo_ms']
+        memory_ratio = r['pico_mib'] / max(b['pico_mib'], 1e-9)
+        flags = []
+        if time_ratio > 1 + tolerance:
+            flags.append('tempo')
+        if r['pico_mib'] > b['pico_mib'] * (1 + tolerance) + MEMORY_SLACK_MIB:
+            flags.append('memória')
+        mark = f"❌ {', '.join(flags)}" if flags else "✅"
+        print(f"{r['operacao']:<28} {r['imagem']:<14} {time_ratio:>8.2f}x {memory_ratio:>8.2f}x {mark}")
+        if flags:
+            regressions.append(f"{r['operacao']} / {r['imagem']}: tempo {time_ratio:.2f}x, "
+                               f"memória {memory_ratio:.2f}x")
+    return regressions
+
+
+def main(argv=None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Benchmark de todas as operações de processamento")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--resolucoes', nargs='*', choices=list(RESOLUTIONS),
+                        default=list(RESOLUTIONS))
+    parser.add_argument('--amostras', type=int, default=2,
+                        help="Imagens de exemplo de ../imagens incluídas (0 = nenhuma)")
+    parser.add_argument('--operacoes', nargs='+', default=None,
+                        help="Só as operações cujo nome contém um destes termos")
+    parser.add_argument('--saida', default=None, help="Arquivo JSON de resultados")
+    parser.add_argument('--comparar', default=None, help="Arquivo JSON de base para comparação")
+    parser.add_argument('--tolerancia', type=float, default=DEFAULT_TOLERANCE,
+                        help="Aumento máximo aceito em relação à base (fração)")
+    args = parser.parse_args(argv)
+
+    operations = [name for name in OPERATIONS
+                  if not args.operacoes or any(term in name for term in args.operacoes)]
+    if not operations:
+        parser.error("Nenhuma operação corresponde a --operacoes")
+
+    images = [(label, synthetic_image(*RESOLUTIONS[label])) for label in args.resolucoes]
+    images += sample_images(args.amostras)
+
+    print(f"{args.repeticoes} repetições (tempo mediano), {len(images)} imagens")
+    print(f"{'Operação':<28} {'Imagem':<14} {'Tamanho':<12} {'Tempo (ms)':>10} "
+          f"{'MP/s':>9} {'Pico (MiB)':>10}")
+    results = run(images, operations, args.repeticoes)
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump({
+                'versao': RESULTS_VERSION,
+                'data': datetime.now().isoformat(timespec='seconds'),
+                'ambiente': environment(),
+                'resultados': results
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultados salvos em {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('versao') != RESULTS_VERSION:
+            print(f"❌ Versão do arquivo de base incompatível: {baseline.get('versao')}")
+            return 2
+        regressions = compare(results, baseline, args.tolerancia)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressões acima de {args.tolerancia:.0%}:")
+            for message in regressions:
+                print(f"   {message}")
+            return 1
+        print(f"\n✅ Sem regressões acima de {args.tolerancia:.0%}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Perfil do tempo de inicialização da interface
+
+Importa o script Streamlit em um interpretador novo com `python -X importtime`
+e mostra o tempo total e a divisão por pacote e por importação direta. O
+servidor Streamlit já tem o próprio streamlit carregado quando executa o
+script de uma sessão, então por padrão ele é importado antes e não entra na
+conta (--com-streamlit inclui).
+
+Com --orcamento, o código de saída é 1 quando o tempo passa do orçamento,
+o que permite usar o script como verificação na integração contínua.
+
+Execução:
+python benchmarks/perfil_inicializacao.py
+python benchmarks/perfil_inicializacao.py --orcamento 500 --repeticoes 5
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+DEFAULT_MODULE = 'sistema_processamento_imagens_v3'
+
+# Orçamento padrão de importação do script (ms)
+DEFAULT_BUDGET_MS = 500
+
+_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def import_profile(module, preload=('streamlit',)):
+    """
+    Importa module em um processo novo; retorna a lista de (self_us, total_us, nível, nome)
+
+    Só entram as importações feitas pelo próprio module (depois de preload).
+    """
+    code = ''.join(f'import {name}; ' for name in preload) + f'import {module}'
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          cwd=SRC_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {module}:\n{proc.stderr[-2000:]}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, total_us, indent, name = match.groups()
+            entries.append((int(self_us), int(total_us), len(indent) // 2, name))
+
+    # A saída é pós-ordem: as dependências de module vêm logo antes dele,
+    # depois da última importação de nível 0 dos módulos pré-carregados
+    end = max(i for i, e in enumerate(entries) if e[2] == 0 and e[3] == module)
+    start = end
+    while start > 0 and entries[start - 1][2] > 0:
+        start -= 1
+    return entries[start:end + 1]
+
+
+def by_package(entries):
+    """Tempo próprio (us) somado por pacote de primeiro nível"""
+    totals = defaultdict(int)
+    for self_us, _, _, name in entries:
+        totals[name.split('.')[0]] += self_us
+    return sorted(totals.items(), key=lambda item: -item[1])
+
+
+def main(argv=None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Perfil do tempo de importação da interface")
+    parser.add_argument('--modulo', default=DEFAULT_MODULE)
+    parser.add_argument('--orcamento', type=float, default=DEFAULT_BUDGET_MS,
+                        help="Tempo máximo de importação em ms (código de saída 1 se exceder)")
+    parser.add_argument('--repeticoes', type=int, default=3,
+                        help="Execuções; vale a mais rápida (menos ruído de disco/cache)")
+    parser.add_argument('--com-streamlit', action='store_true',
+                        help="Conta também a importação do streamlit")
+    parser.add_argument('--top', type=int, default=10, help="Linhas em cada tabela")
+    args = parser.parse_args(argv)
+
+    preload = () if args.com_streamlit else ('streamlit',)
+    runs = [import_profile(args.modulo, preload) for _ in range(max(1, args.repeticoes))]
+    entries = min(runs, key=lambda run: run[-1][1])
+    total_ms = entries[-1][1] / 1000
+
+    print(f"📦 {args.modulo}: {total_ms:.0f} ms "
+          f"(melhor de {len(runs)}; orçamento {args.orcamento:.0f} ms)")
+
+    print(f"\n{'Pacote':<34} {'Tempo próprio (ms)':>19}")
+    for package, self_us in by_package(entries)[:args.top]:
+        print(f"{package:<34} {self_us / 1000:>19.1f}")
+
+    direct = [e for e in entries if e[2] == 1]
+    print(f"\n{'Importação direta':<40} {'Acumulado (ms)':>15}")
+    for _, total_us, _, name in sorted(direct, key=lambda e: -e[1])[:args.top]:
+        print(f"{name:<40} {total_us / 1000:>15.1f}")
+
+    if total_ms > args.orcamento:
+        print(f"\n❌ Importação acima do orçamento ({total_ms:.0f} ms > {args.orcamento:.0f} ms)")
+        return 1
+    print("\n✅ Dentro do orçamento")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
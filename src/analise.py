@@ -0,0 +1,150 @@
+"""
+Produtos da aba Análise e dos gráficos de métricas
+
+Diferença, mapas de bordas, histogramas e gráficos são calculados uma vez
+por versão das imagens (ver AnalysisCache) e guardados de forma compacta:
+diferença em uint8 e histogramas em float32 (3 × 256). Os gráficos são
+especificações Vega-Lite prontas (st.vega_lite_chart): só os valores vão
+para o navegador, que desenha o gráfico, sem figuras matplotlib nem PNGs
+no servidor.
+Reexecuções do script que não mudam as imagens (troca de aba, widgets não
+relacionados) apenas reexibem os produtos prontos.
+"""
+
+import weakref
+
+import cv2
+import numpy as np
+
+import artefatos
+import processamento as proc
+
+CHANNEL_NAMES = ['RED', 'GREEN', 'BLUE']
+CHANNEL_COLORS = ['#ff0000', '#008000', '#0000ff']
+
+
+def histograms(img):
+    """Histogramas RGB (3×256, float32) de img, em cache por versão da imagem"""
+    def compute():
+        return np.stack([cv2.calcHist([img], [i], None, [256], [0, 256])[:, 0] for i in range(3)])
+    return artefatos.ARTIFACTS.get_or_compute(img, 'histogramas', (), compute)
+
+
+def histogram_spec(hist, title):
+    """Especificação Vega-Lite do histograma RGB (linhas R, G, B com 256 pontos)"""
+    values = [
+        {'intensidade': i, 'canal': name, 'pixels': float(count)}
+        for name, channel in zip(CHANNEL_NAMES, hist)
+        for i, count in enumerate(channel)
+    ]
+    return {
+        'title': title,
+        'data': {'values': values},
+        'mark': {'type': 'line', 'opacity': 0.7},
+        'encoding': {
+            'x': {'field': 'intensidade', 'type': 'quantitative', 'scale': {'domain': [0, 255]}},
+            'y': {'field': 'pixels', 'type': 'quantitative'},
+            'color': {'field': 'canal', 'type': 'nominal',
+                      'scale': {'domain': CHANNEL_NAMES, 'range': CHANNEL_COLORS}}
+        },
+        'height': 300
+    }
+
+
+def metric_specs(m):
+    """
+    Especificações Vega-Lite das barras de PSNR, SSIM, LC e Edge com os limiares
+
+    Cada gráfico leva só um valor e as linhas de limiar; o navegador desenha.
+    """
+    specs = [
+        ('PSNR', m['PSNR'], m['psnr_ok'], [proc.PSNR_THRESHOLD], None, 'dB'),
+        ('SSIM', m['SSIM'], m['ssim_ok'], [proc.SSIM_THRESHOLD], [0, 1], None),
+        ('Local Contrast', m['LC'], m['lc_ok'], [proc.LC_MIN_THRESHOLD], None, None),
+        ('Edge Sharpness', m['Edge_Sharpness'], m['edge_ok'],
+         [proc.EDGE_MIN_THRESHOLD, proc.EDGE_MAX_THRESHOLD], [0, max(0.3, m['Edge_Sharpness'] * 1.2)], None),
+    ]
+    charts = []
+    for title, value, ok, thresholds, domain, unit in specs:
+        y = {'field': 'valor', 'type': 'quantitative', 'title': unit}
+        if domain:
+            y['scale'] = {'domain': domain}
+        charts.append({
+            'title': title,
+            'height': 260,
+            'layer': [
+                {
+                    'data': {'values': [{'métrica': title, 'valor': float(value)}]},
+                    'mark': {'type': 'bar', 'color': 'green' if ok else 'orange', 'opacity': 0.7},
+                    'encoding': {'x': {'field': 'métrica', 'type': 'nominal', 'title': None}, 'y': y}
+                },
+                {
+                    'data': {'values': [{'limiar': t} for t in thresholds]},
+                    'mark': {'type': 'rule', 'color': 'red', 'strokeDash': [6, 4]},
+                    'encoding': {'y': {'field': 'limiar', 'type': 'quantitative'}}
+                }
+            ]
+        })
+    return charts
+
+
+def difference(current, preview):
+    """
+    Diferença absoluta (uint8) entre a imagem atual e o preview, com média e máximo
+
+    Um preview ao vivo ainda em resolução reduzida é ampliado para o tamanho
+    da imagem atual.
+    """
+    if preview.shape != current.shape:
+        preview = cv2.resize(preview, current.shape[1::-1], interpolation=cv2.INTER_LINEAR)
+    # Congelada: a codificação para exibição fica no cache de artefatos
+    diff = artefatos.freeze(cv2.absdiff(current, preview))
+    return diff, float(np.mean(diff)), float(diff.max())
+
+
+def analysis_products(original, processed, original_view, processed_view):
+    """
+    Produtos da aba Análise para um par de imagens
+
+    original/processed são as imagens de trabalho (histogramas) e
+    original_view/processed_view as versões exibidas (diferença e bordas;
+    no modo nativo, os proxies reduzidos).
+    """
+    return {
+        # |a - b| de uint8 cabe em uint8: 4× menor que a diferença em float32
+        'diff': artefatos.freeze(cv2.absdiff(original_view, processed_view)),
+        'edges_original': artefatos.canny(original_view),
+        'edges_processed': artefatos.canny(processed_view),
+        'hist_original': histogram_spec(histograms(original), 'Original'),
+        'hist_processed': histogram_spec(histograms(processed), 'Processada')
+    }
+
+
+class AnalysisCache:
+    """
+    Último resultado de uma função por versão das entradas
+
+    As entradas são comparadas por identidade (mesma convenção do cache de
+    artefatos): enquanto os mesmos objetos forem passados, o resultado
+    guardado é devolvido sem recalcular.
+    """
+
+    def __init__(self):
+        self._refs = ()
+        self._value = None
+
+    @staticmethod
+    def _ref(obj):
+        # Arrays por weakref: o cache não prende versões antigas das imagens
+        try:
+            return weakref.ref(obj)
+        except TypeError:
+            return lambda: obj
+
+    def get_or_compute(self, inputs, compute):
+        """Resultado de compute() para as entradas, recalculado só quando mudam"""
+        inputs = tuple(inputs)
+        if len(inputs) != len(self._refs) or any(ref() is not obj for ref, obj in zip(self._refs, inputs)):
+            self._value = compute()
+            self._refs = tuple(self._ref(obj) for obj in inputs)
+        return self._value
@@ -0,0 +1,102 @@
+"""
+Armazenamento de imagens em arquivos mapeados em memória
+
+Mantém os buffers de uma sessão (original, normalizada, processada,
+preview e versões) em arquivos .npy sob um diretório
+próprio da sessão, abertos com np.memmap. O sistema operacional carrega e
+descarta as páginas conforme o uso, o que permite muitas sessões
+simultâneas no mesmo servidor sem esgotar a RAM.
+"""
+
+import itertools
+import os
+import shutil
+import tempfile
+import weakref
+
+import numpy as np
+
+# Diretório base dos armazenamentos (padrão: diretório temporário do sistema)
+STORE_DIR_ENV = 'IMAGENS_MEMMAP_DIR'
+
+
+class MemmapImageStore:
+    """Buffers de imagem de uma sessão em arquivos .npy mapeados em memória"""
+
+    def __init__(self, base_dir=None):
+        base_dir = base_dir or os.environ.get(STORE_DIR_ENV) or None
+        if base_dir:
+            os.makedirs(base_dir, exist_ok=True)
+        self.path = os.path.abspath(tempfile.mkdtemp(prefix='sessao_', dir=base_dir))
+        self._files = {}
+        self._counter = itertools.count()
+        # Remove o diretório quando o armazenamento (e a sessão) for descartado
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.path, ignore_errors=True)
+
+    def put(self, key, img):
+        """
+        Grava img sob key e retorna a versão mapeada em memória (somente leitura)
+
+        Cada gravação usa um arquivo novo; o anterior é removido, mas arrays
+        que ainda o referenciam continuam válidos até serem descartados.
+        """
+        if img is None:
+            self.delete(key)
+            return None
+        if isinstance(img, np.memmap) and self._files.get(key) == img.filename:
+            return img
+
+        path = os.path.join(self.path, f"{key}_{next(self._counter)}.npy")
+        out = np.lib.format.open_memmap(path, mode='w+', dtype=img.dtype, shape=img.shape)
+        out[...] = img
+        out.flush()
+        del out
+
+        self.delete(key)
+        self._files[key] = path
+        return np.load(path, mmap_mode='r')
+
+    def get(self, key):
+        """Array mapeado em memória de key, ou None"""
+        path = self._files.get(key)
+        return None if path is None else np.load(path, mmap_mode='r')
+
+    def delete(self, key):
+        """Remove o arquivo de key (se existir)"""
+        path = self._files.pop(key, None)
+        if path is not None:
+            try:
+                os.unlink(path)
+            except OSError:
+                # Windows não remove arquivos mapeados; clear() tenta de novo
+                pass
+
+    def discard(self, arr):
+        """Remove o arquivo do qual arr foi mapeado (se pertencer a este armazenamento)"""
+        filename = getattr(arr, 'filename', None)
+        for key, path in list(self._files.items()):
+            if path == filename:
+                self.delete(key)
+
+    def keys(self):
+        """Chaves armazenadas"""
+        return list(self._files)
+
+    def nbytes(self):
+        """Total de bytes em disco"""
+        return sum(os.path.getsize(p) for p in self._files.values() if os.path.exists(p))
+
+    def clear(self):
+        """Remove todos os buffers da sessão"""
+        for key in list(self._files):
+            self.delete(key)
+        for name in os.listdir(self.path):
+            try:
+                os.unlink(os.path.join(self.path, name))
+            except OSError:
+                pass
+
+    def close(self):
+        """Remove o diretório da sessão"""
+        self._files.clear()
+        self._finalizer()
@@ -0,0 +1,199 @@
+"""
+Cache de artefatos derivados por versão de imagem
+
+Tons de cinza, gradientes de Sobel, bordas de Canny e densidade de bordas
+são usados pela proteção anti-oversharpening, pelas métricas e pela aba
+Análise, muitas vezes sobre a mesma imagem. Aqui cada artefato é calculado
+uma vez por imagem e reaproveitado por todos.
+
+A versão de uma imagem é a identidade do array, o que só vale para arrays
+que ninguém pode alterar no próprio buffer: somente leitura, assim como
+todos os arrays de que são vistas (freeze). A interface congela as imagens
+da sessão, os proxies e os estágios memorizados; arrays graváveis (um
+buffer que o chamador pode editar e passar de novo) não entram no cache e
+seus artefatos são recalculados a cada chamada. As entradas de um array
+são descartadas quando ele é coletado (weakref) e o total fica limitado
+por um orçamento em bytes (descarte LRU). Os artefatos são somente leitura.
+
+Uso:
+    edges = artefatos.canny(img)
+    density = artefatos.edge_density(img)
+"""
+
+import threading
+import weakref
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# Orçamento de memória dos artefatos
+ARTIFACT_MAX_BYTES = 256 * 2 ** 20
+
+# Limiares de Canny usados em todo o projeto
+CANNY_THRESHOLDS = (100, 200)
+
+
+def is_frozen(img):
+    """Se img e os arrays de que ela é vista são somente leitura (conteúdo fixo)"""
+    while isinstance(img, np.ndarray):
+        if img.flags.writeable:
+            return False
+        img = img.base
+    return True
+
+
+def freeze(img):
+    """Marca img como somente leitura (versão fixa, elegível ao cache); retorna img"""
+    if img is not None:
+        img.flags.writeable = False
+    return img
+
+
+class ArtifactCache:
+    """Artefatos por (identidade da imagem, nome, parâmetros), com orçamento LRU"""
+
+    def __init__(self, max_bytes=ARTIFACT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        # id da imagem -> (weakref, chaves das entradas dessa imagem)
+        self._images = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        """Bytes ocupados pelos artefatos"""
+        return self._bytes
+
+    def get_or_compute(self, img, name, params, compute):
+        """
+        Artefato name de img (calculado por compute() na primeira vez)
+
+        Com img gravável o artefato é sempre recalculado (ver is_frozen).
+        """
+        if not is_frozen(img):
+            self.misses += 1
+            return compute()
+        key = (id(img), name, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._images[id(img)][0]() is img:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        value = compute()
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+        self._put(img, key, value)
+        return value
+
+    def _put(self, img, key, value):
+        if isinstance(value, np.ndarray):
+            size = value.nbytes
+        elif isinstance(value, bytes):
+            size = len(value)
+        else:
+            size = 64
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            image_id = id(img)
+            known = self._images.get(image_id)
+            if known is None or known[0]() is not img:
+                try:
+                    ref = weakref.ref(img, lambda r: self._forget(image_id, r))
+                except TypeError:
+                    return
+                if known is not None:
+                    self._forget(image_id, known[0])
+                known = (ref, set())
+                self._images[image_id] = known
+            known[1].add(key)
+
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                evicted, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                # Descartar um artefato pode coletar outra imagem (_forget reentrante)
+                owner = self._images.get(evicted[0])
+                if owner is not None:
+                    owner[1].discard(evicted)
+                    if not owner[1]:
+                        del self._images[evicted[0]]
+
+    def _forget(self, image_id, ref):
+        """Descarta as entradas de uma imagem coletada"""
+        with self._lock:
+            known = self._images.get(image_id)
+            # O id pode já ter sido reaproveitado por outra imagem
+            if known is None or known[0] is not ref:
+                return
+            del self._images[image_id]
+            for key in list(known[1]):
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._bytes -= entry[1]
+
+    def clear(self):
+        """Remove todos os artefatos"""
+        with self._lock:
+            self._entries.clear()
+            self._images.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Contadores de acertos, falhas e ocupação"""
+        return {
+            'acertos': self.hits,
+            'falhas': self.misses,
+            'entradas': len(self._entries),
+            'bytes': self._bytes
+        }
+
+
+# Cache compartilhado pelo processo (interface, métricas e pipeline)
+ARTIFACTS = ArtifactCache()
+
+
+def gray(img):
+    """Tons de cinza de uma imagem RGB (a própria imagem se já for 2D)"""
+    if img.ndim == 2:
+        return img
+    return ARTIFACTS.get_or_compute(img, 'gray', (), lambda: cv2.cvtColor(img, cv2.COLOR_RGB2GRAY))
+
+
+def gradient_magnitude(img):
+    """Magnitude do gradiente de Sobel (float64)"""
+    def compute():
+        # Sem guardar gx e gy: só a magnitude é usada pela nitidez Sobel
+        g = gray(img)
+        gx = cv2.Sobel(g, cv2.CV_64F, 1, 0, ksize=3)
+        gy = cv2.Sobel(g, cv2.CV_64F, 0, 1, ksize=3)
+        return np.sqrt(gx ** 2 + gy ** 2)
+    return ARTIFACTS.get_or_compute(img, 'sobel_mag', (), compute)
+
+
+def canny(img, threshold1=CANNY_THRESHOLDS[0], threshold2=CANNY_THRESHOLDS[1]):
+    """Mapa de bordas de Canny dos tons de cinza"""
+    return ARTIFACTS.get_or_compute(img, 'canny', (threshold1, threshold2),
+                                    lambda: cv2.Canny(gray(img), threshold1, threshold2))
+
+
+def edge_density(img, threshold1=CANNY_THRESHOLDS[0], threshold2=CANNY_THRESHOLDS[1]):
+    """Fração de pixels de borda (Canny) da imagem"""
+    def compute():
+        edges = canny(img, threshold1, threshold2)
+        return cv2.countNonZero(edges) / edges.size
+    return ARTIFACTS.get_or_compute(img, 'edge_density', (threshold1, threshold2), compute)
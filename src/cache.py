@@ -0,0 +1,272 @@
+"""
+Cache de resultados em dois níveis (memória e disco)
+
+Resultados de operações são memorizados por uma chave que combina o hash do
+conteúdo da imagem de entrada, o nome da operação, os parâmetros e as
+versões das bibliotecas (uma atualização do OpenCV invalida o cache). O
+primeiro nível fica em memória, limitado por um orçamento em bytes, com
+descarte LRU ou FIFO; o segundo, opcional, grava os resultados em disco
+(pickle) e também tem orçamento próprio, descartando os arquivos mais
+antigos. Acertos no disco são promovidos para a memória.
+
+Uso:
+    cache = ResultCache(max_bytes=256 * 2**20, disk_dir='.cache')
+    out = cache.get_or_compute(img, 'preprocess', params, lambda: proc.preprocess(img, **params))
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+import skimage
+
+from artefatos import is_frozen
+
+# Incrementar quando uma operação do projeto mudar de resultado
+CACHE_VERSION = 2
+
+LIBRARY_VERSIONS = (CACHE_VERSION, np.__version__, cv2.__version__, skimage.__version__)
+
+DEFAULT_MEMORY_BYTES = 256 * 2 ** 20
+DEFAULT_DISK_BYTES = 2 * 2 ** 30
+EVICTION_POLICIES = ('lru', 'fifo')
+
+# Configuração por variáveis de ambiente (usada pela interface)
+CACHE_MB_ENV = 'IMAGENS_CACHE_MB'
+CACHE_DIR_ENV = 'IMAGENS_CACHE_DIR'
+CACHE_POLICY_ENV = 'IMAGENS_CACHE_POLITICA'
+
+
+def _nbytes(value):
+    """Tamanho aproximado de um resultado (arrays dentro de tuplas/listas/dicts)"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    return 64
+
+
+def _freeze(value):
+    """Marca os arrays do resultado como somente leitura (são compartilhados)"""
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, (tuple, list)):
+        for v in value:
+            _freeze(v)
+    elif isinstance(value, dict):
+        for v in value.values():
+            _freeze(v)
+
+
+# Hash de conteúdo por array (evita recalcular para a mesma imagem da sessão)
+_digests = {}
+
+
+def content_hash(data):
+    """
+    Hash (hex) do conteúdo de um array ou bytes
+
+    O hash de um array congelado (artefatos.is_frozen, como as imagens da
+    sessão) é guardado enquanto o array existir; o de um array gravável é
+    recalculado a cada chamada, pois o conteúdo pode ter mudado.
+    """
+    memoize = isinstance(data, np.ndarray) and is_frozen(data)
+    if memoize:
+        cached = _digests.get(id(data))
+        if cached is not None and cached[0]() is data:
+            return cached[1]
+
+    h = hashlib.blake2b(digest_size=20)
+    if isinstance(data, np.ndarray):
+        h.update(repr((data.shape, data.dtype.str)).encode())
+        h.update(memoryview(np.ascontiguousarray(data)).cast('B'))
+    else:
+        h.update(data)
+    digest = h.hexdigest()
+
+    if memoize:
+        key = id(data)
+        try:
+            ref = weakref.ref(data, lambda _: _digests.pop(key, None))
+        except TypeError:
+            return digest
+        _digests[key] = (ref, digest)
+    return digest
+
+
+def make_key(data, op, params):
+    """Chave do cache para (conteúdo de data, operação, parâmetros, versões)"""
+    if isinstance(params, dict):
+        params = sorted(params.items())
+    h = hashlib.blake2b(digest_size=20)
+    h.update(repr((content_hash(data), op, params, LIBRARY_VERSIONS)).encode())
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Cache LRU/FIFO em memória com orçamento de bytes e nível opcional em disco"""
+
+    def __init__(self, max_bytes=DEFAULT_MEMORY_BYTES, disk_dir=None,
+                 disk_max_bytes=DEFAULT_DISK_BYTES, policy='lru'):
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Política de descarte desconhecida: {policy}")
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.policy = policy
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        """Bytes ocupados pelo nível em memória"""
+        return self._bytes
+
+    def get(self, key):
+        """Resultado guardado sob key, ou None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self.policy == 'lru':
+                    self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        value = self._disk_get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        _freeze(value)
+        self._memory_put(key, value)
+        return value
+
+    def put(self, key, value):
+        """Guarda value sob key nos dois níveis (arrays passam a ser somente leitura)"""
+        _freeze(value)
+        self._memory_put(key, value)
+        self._disk_put(key, value)
+
+    def get_or_compute(self, data, op, params, compute):
+        """Resultado de compute() para (data, op, params), do cache quando possível"""
+        key = make_key(data, op, params)
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self, disk=False):
+        """Esvazia o nível em memória (e o de disco, se disk=True)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if disk and self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.pkl'):
+                    os.unlink(os.path.join(self.disk_dir, name))
+
+    def stats(self):
+        """Contadores de acertos, falhas, descartes e ocupação"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'acertos_memoria': self.hits,
+            'acertos_disco': self.disk_hits,
+            'falhas': self.misses,
+            'taxa_acerto': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            'descartes': self.evictions,
+            'entradas': len(self._entries),
+            'bytes_memoria': self._bytes
+        }
+
+    def _memory_put(self, key, value):
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        # Marca o uso para o descarte por antiguidade
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def _disk_put(self, key, value):
+        if not self.disk_dir:
+            return
+        # Gravação atômica: vários processos podem compartilhar o diretório
+        fd, tmp = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._disk_path(key))
+        self._disk_evict()
+
+    def _disk_evict(self):
+        """Remove os arquivos usados há mais tempo até caber no orçamento"""
+        files = []
+        total = 0
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith('.pkl'):
+                st = entry.stat()
+                files.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+
+
+def cache_from_env():
+    """ResultCache configurado por IMAGENS_CACHE_MB, IMAGENS_CACHE_DIR e IMAGENS_CACHE_POLITICA"""
+    max_mb = float(os.environ.get(CACHE_MB_ENV, DEFAULT_MEMORY_BYTES / 2 ** 20))
+    return ResultCache(
+        max_bytes=int(max_mb * 2 ** 20),
+        disk_dir=os.environ.get(CACHE_DIR_ENV) or None,
+        policy=os.environ.get(CACHE_POLICY_ENV, 'lru')
+    )
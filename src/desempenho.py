@@ -0,0 +1,202 @@
+"""
+Medição de desempenho por etapa (independente do Streamlit)
+
+Cada operação da interface (pré-processamento, nitidez, contraste, pipeline
+híbrido, métricas, relatório) é medida por um StageRecorder: a operação
+inteira e as etapas internas (nós do pipeline híbrido, partes das métricas)
+registram tempo, formato e dtype da entrada e da saída e pico de alocação.
+O resultado (StageRecorder.timing) vai para o histórico de desempenho da
+sessão, para o painel da aba Relatório e para o PDF.
+
+O pico de alocação vem do tracemalloc: inclui os arrays NumPy/OpenCV
+devolvidos e os temporários NumPy, não os buffers internos do OpenCV. O
+rastreamento fica ligado só enquanto alguma operação está sendo medida
+(ligado o tempo todo, ele deixaria cada reexecução do script ~3× mais
+lenta). Com várias operações simultâneas o pico é o do processo, portanto
+aproximado. IMAGENS_PERFIL_MEMORIA=0 desliga a medição de memória.
+
+Uso:
+    recorder = StageRecorder()
+    with recorder.stage('híbrido', img) as record:
+        out = recorder.call('gaussian', proc.gaussian_blur, img, 1.0)
+        set_output(record, out)
+    timing = recorder.timing()
+"""
+
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+
+import rastreamento
+
+TRACK_MEMORY_ENV = 'IMAGENS_PERFIL_MEMORIA'
+TRACK_MEMORY = os.environ.get(TRACK_MEMORY_ENV, '1') != '0'
+
+# Operações medidas em andamento (o tracemalloc fica ligado enquanto > 0)
+_tracing_users = 0
+_tracing_owned = False
+_tracing_lock = threading.Lock()
+
+
+def _start_tracing():
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        if _tracing_users == 0:
+            # Um rastreamento já ligado por outro código não é desligado aqui
+            _tracing_owned = not tracemalloc.is_tracing()
+            if _tracing_owned:
+                tracemalloc.start()
+        _tracing_users += 1
+
+
+def _stop_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_owned:
+            tracemalloc.stop()
+
+
+def describe(value):
+    """(formato, dtype) de value: arrays, tuplas cujo primeiro item é array ou escalares"""
+    if isinstance(value, tuple) and value and isinstance(value[0], np.ndarray):
+        value = value[0]
+    if isinstance(value, np.ndarray):
+        return tuple(value.shape), str(value.dtype)
+    if value is None:
+        return None, None
+    return None, type(value).__name__
+
+
+def set_output(record, value):
+    """Registra formato e dtype da saída de uma etapa"""
+    record['saida'], record['dtype'] = describe(value)
+
+
+class StageRecorder:
+    """Etapas medidas de uma operação (tempo, formatos, dtype e pico de alocação)"""
+
+    def __init__(self, track_memory=None):
+        self.track_memory = TRACK_MEMORY if track_memory is None else track_memory
+        self.records = []
+        self._origin = time.perf_counter()
+        # Medições de memória abertas (etapas aninhadas): [base, máximo]
+        self._open = []
+
+    def _checkpoint(self):
+        """Propaga o pico atual às etapas abertas antes de reiniciá-lo"""
+        peak = tracemalloc.get_traced_memory()[1]
+        for watch in self._open:
+            watch[1] = max(watch[1], peak)
+
+    @contextmanager
+    def stage(self, name, inputs=None):
+        """
+        Mede o bloco como a etapa name; devolve o registro da etapa
+
+        inputs é a entrada principal (formato registrado); a saída é
+        registrada com set_output(registro, valor).
+        """
+        record = {
+            'etapa': name,
+            'nivel': len(self._open),
+            'inicio_ms': (time.perf_counter() - self._origin) * 1000,
+            'entrada': describe(inputs)[0],
+            'saida': None,
+            'dtype': None,
+            'ms': 0.0,
+            'pico_mib': None
+        }
+        memory = self.track_memory
+        if memory:
+            if not self._open:
+                _start_tracing()
+            self._checkpoint()
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            self._open.append([current, current])
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['ms'] = (time.perf_counter() - start) * 1000
+            if memory:
+                self._checkpoint()
+                base, peak = self._open.pop()
+                record['pico_mib'] = (peak - base) / 2 ** 20
+                if not self._open:
+                    _stop_tracing()
+            self.records.append(record)
+
+    def call(self, name, func, *args, **kwargs):
+        """func(*args, **kwargs) medida como a etapa name (entrada: o primeiro argumento)"""
+        with self.stage(name, args[0] if args else None) as record:
+            value = func(*args, **kwargs)
+            set_output(record, value)
+        return value
+
+    def timing(self):
+        """
+        Registro da operação: a última etapa de nível 0, com as etapas
+        internas (em ordem de início) em 'etapas'
+        """
+        top = next((r for r in reversed(self.records) if r['nivel'] == 0), None)
+        if top is None:
+            return None
+        stages = sorted((r for r in self.records if r['nivel'] > 0), key=lambda r: r['inicio_ms'])
+        return dict(top, etapas=stages)
+
+
+def measure(name, func, inputs=None, track_memory=None):
+    """(func(recorder), registro) com func medida como a operação name"""
+    recorder = StageRecorder(track_memory)
+    with rastreamento.span(name, 'operacao'), recorder.stage(name, inputs) as record:
+        value = func(recorder)
+        set_output(record, value)
+    return value, recorder.timing()
+
+
+def shape_text(shape):
+    """Formato como texto (512×512×3); '—' para valores sem formato"""
+    return '×'.join(map(str, shape)) if shape else '—'
+
+
+def format_timing(timing):
+    """Resumo de uma linha: tempo, formatos e pico de alocação"""
+    parts = [f"{timing['ms']:.0f} ms"]
+    if timing['entrada'] or timing['saida']:
+        shapes = f"{shape_text(timing['entrada'])} → {shape_text(timing['saida'])}"
+        parts.append(shapes + (f" {timing['dtype']}" if timing['dtype'] else ''))
+    if timing['pico_mib'] is not None:
+        parts.append(f"pico {timing['pico_mib']:.1f} MiB")
+    return ', '.join(parts)
+
+
+def _row(record, first_column, name):
+    return {
+        first_column: name,
+        'Tempo (ms)': round(record['ms'], 1),
+        'Entrada': shape_text(record['entrada']),
+        'Saída': shape_text(record['saida']),
+        'dtype': record['dtype'] or '—',
+        'Pico (MiB)': None if record['pico_mib'] is None else round(record['pico_mib'], 1)
+    }
+
+
+def operation_rows(performance):
+    """Linhas de tabela (uma por operação) do histórico de desempenho"""
+    return [dict(Hora=t['hora'], **_row(t, 'Operação', t['acao'])) for t in performance]
+
+
+def stage_rows(timing):
+    """Linhas de tabela das etapas de uma operação, com a fração do tempo total"""
+    rows = []
+    for record in timing['etapas']:
+        row = _row(record, 'Etapa', '  ' * (record['nivel'] - 1) + record['etapa'])
+        row['% do total'] = round(100 * record['ms'] / timing['ms'], 1) if timing['ms'] else None
+        rows.append(row)
+    return rows
@@ -0,0 +1,166 @@
+"""
+Executor de tarefas em segundo plano para a interface
+
+Cada tarefa recebe um identificador e um token de cancelamento e pertence a
+um canal ('preview', 'aplicar', 'metricas', ...). Dentro de um canal vale
+a política "o pedido mais recente vence": submeter uma tarefa cancela a
+anterior do mesmo canal (se ainda estiver na fila, nem chega a executar; se
+estiver executando, o token é sinalizado e o resultado é descartado).
+Assim, mudanças rápidas de parâmetros nunca acumulam trabalho obsoleto.
+
+As funções recebem o token e podem consultá-lo entre etapas
+(token.check() interrompe com Cancelled). Os resultados são recolhidos pelo
+script da interface com completed(), que entrega só as tarefas mais
+recentes de cada canal.
+"""
+
+import itertools
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+
+class Cancelled(Exception):
+    """Tarefa interrompida por um pedido mais recente"""
+
+
+class CancelToken:
+    """Sinal de cancelamento compartilhado entre a interface e a tarefa"""
+
+    __slots__ = ('_event',)
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        """Interrompe a tarefa (Cancelled) se ela foi cancelada"""
+        if self._event.is_set():
+            raise Cancelled()
+
+
+class Job:
+    """Tarefa submetida: identificador, canal, token e callback de conclusão"""
+
+    __slots__ = ('id', 'channel', 'token', 'future', 'on_done', 'label', 'submitted')
+
+    def __init__(self, job_id, channel, token, future, on_done, label):
+        self.id = job_id
+        self.channel = channel
+        self.token = token
+        self.future = future
+        self.on_done = on_done
+        self.label = label
+        self.submitted = time.perf_counter()
+
+    def status(self):
+        """'cancelada', 'concluida', 'executando' ou 'na fila'"""
+        if self.token.cancelled or self.future.cancelled():
+            return 'cancelada'
+        if self.future.done():
+            return 'concluida'
+        return 'executando' if self.future.running() else 'na fila'
+
+
+def _run(token, func):
+    token.check()
+    return func(token)
+
+
+class BackgroundExecutor:
+    """
+    Pool de threads com canais "o mais recente vence"
+
+    Uso:
+        ex = BackgroundExecutor()
+        ex.submit('preview', lambda token: proc.preprocess(img, ...), on_done=mostrar)
+        for job, result, error in ex.completed():
+            job.on_done(result)
+    """
+
+    def __init__(self, workers=2):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fundo')
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        # Tarefa mais recente de cada canal (ainda não recolhida)
+        self._latest = {}
+
+    def submit(self, channel, func, on_done=None, label=None):
+        """Submete func(token) no canal, cancelando a tarefa anterior; retorna o id"""
+        token = CancelToken()
+        with self._lock:
+            previous = self._latest.get(channel)
+            if previous is not None:
+                previous.token.cancel()
+                previous.future.cancel()
+            job = Job(next(self._ids), channel, token, self._pool.submit(_run, token, func),
+                      on_done, label)
+            self._latest[channel] = job
+        return job.id
+
+    def cancel(self, channel=None):
+        """Cancela a tarefa do canal (ou de todos os canais)"""
+        with self._lock:
+            channels = list(self._latest) if channel is None else [channel]
+            for name in channels:
+                job = self._latest.pop(name, None)
+                if job is not None:
+                    job.token.cancel()
+                    job.future.cancel()
+
+    def pending(self, channel=None):
+        """Há tarefa não recolhida no canal (ou em qualquer canal)"""
+        with self._lock:
+            if channel is None:
+                return bool(self._latest)
+            return channel in self._latest
+
+    def running(self):
+        """Tarefas ainda não concluídas: lista de (canal, rótulo, segundos decorridos)"""
+        now = time.perf_counter()
+        with self._lock:
+            return [(job.channel, job.label, now - job.submitted)
+                    for job in self._latest.values() if not job.future.done()]
+
+    def status(self, job_id):
+        """Estado da tarefa job_id ('recolhida' se já entregue ou substituída)"""
+        with self._lock:
+            for job in self._latest.values():
+                if job.id == job_id:
+                    return job.status()
+        return 'recolhida'
+
+    def completed(self, channel=None):
+        """
+        Recolhe as tarefas concluídas (do canal ou de todos): lista de (job, resultado, erro)
+
+        Tarefas canceladas não aparecem; o erro é None em caso de sucesso.
+        """
+        with self._lock:
+            done = [job for job in self._latest.values()
+                    if job.future.done() and channel in (None, job.channel)]
+            for job in done:
+                del self._latest[job.channel]
+
+        outcomes = []
+        for job in done:
+            if job.token.cancelled:
+                continue
+            try:
+                outcomes.append((job, job.future.result(), None))
+            except (Cancelled, CancelledError):
+                continue
+            except Exception as e:
+                outcomes.append((job, None, e))
+        return outcomes
+
+    def shutdown(self):
+        """Cancela tudo e encerra as threads"""
+        self.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
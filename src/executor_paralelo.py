@@ -0,0 +1,202 @@
+"""
+Executor multi-processo para pipelines em lote
+
+Distribui tarefas independentes (uma por imagem) entre processos, com
+número de workers e profundidade máxima de tarefas em andamento
+configuráveis. Arrays NumPy nos argumentos e nos resultados trafegam por
+memória compartilhada (multiprocessing.shared_memory) em vez de serem
+serializados com pickle.
+
+Para não disputar núcleos com as threads internas do OpenCV, cada worker
+limita cv2.setNumThreads de forma que workers × threads ≤ núcleos.
+
+Com o rastreamento ligado (rastreamento.py), cópias de e para a memória
+compartilhada e a execução de cada tarefa aparecem no trace, no pai e nos
+workers.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import rastreamento
+
+
+class SharedArray:
+    """Referência serializável a um array em memória compartilhada"""
+
+    __slots__ = ('name', 'shape', 'dtype')
+
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+    def __getstate__(self):
+        return (self.name, self.shape, self.dtype)
+
+    def __setstate__(self, state):
+        self.name, self.shape, self.dtype = state
+
+
+def to_shared(arr):
+    """Copia arr para um bloco de memória compartilhada; retorna (shm, referência)"""
+    arr = np.ascontiguousarray(arr)
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+    return shm, SharedArray(shm.name, arr.shape, arr.dtype.str)
+
+
+def from_shared(ref, unlink=False):
+    """Lê (copiando) o array referenciado; opcionalmente libera o bloco"""
+    shm = shared_memory.SharedMemory(name=ref.name)
+    try:
+        return np.ndarray(ref.shape, dtype=np.dtype(ref.dtype), buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        if unlink:
+            shm.unlink()
+
+
+def _pack(value, blocks):
+    """Substitui arrays (também dentro de tuplas/listas/dicts) por SharedArray"""
+    if isinstance(value, np.ndarray):
+        shm, ref = to_shared(value)
+        blocks.append(shm)
+        return ref
+    if isinstance(value, (tuple, list)):
+        return type(value)(_pack(v, blocks) for v in value)
+    if isinstance(value, dict):
+        return {k: _pack(v, blocks) for k, v in value.items()}
+    return value
+
+
+def _unpack(value, unlink):
+    """Operação inversa de _pack"""
+    if isinstance(value, SharedArray):
+        return from_shared(value, unlink=unlink)
+    if isinstance(value, (tuple, list)):
+        return type(value)(_unpack(v, unlink) for v in value)
+    if isinstance(value, dict):
+        return {k: _unpack(v, unlink) for k, v in value.items()}
+    return value
+
+
+def _init_worker(opencv_threads):
+    """Inicialização de cada worker: limita as threads internas do OpenCV"""
+    import cv2
+    cv2.setNumThreads(opencv_threads)
+
+
+def _run_task(func, packed_args):
+    """Executa func no worker; entradas e saídas via memória compartilhada"""
+    with rastreamento.span('desempacotar', 'memoria_compartilhada'):
+        args = _unpack(packed_args, unlink=False)
+    with rastreamento.span('tarefa', 'executor'):
+        result = func(*args)
+    blocks = []
+    with rastreamento.span('empacotar', 'memoria_compartilhada'):
+        packed = _pack(result, blocks)
+    # O processo pai lê e libera os blocos do resultado
+    for shm in blocks:
+        shm.close()
+    return packed
+
+
+def default_workers():
+    """Número padrão de workers: um por núcleo disponível"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class ParallelExecutor:
+    """
+    Pool de processos com fila limitada de tarefas em andamento
+
+    Uso:
+        with ParallelExecutor(workers=8) as ex:
+            for item, result, error in ex.imap_unordered(func, items):
+                ...
+    """
+
+    def __init__(self, workers=None, max_in_flight=None, opencv_threads=None):
+        self.workers = max(1, workers or default_workers())
+        self.max_in_flight = max(1, max_in_flight or 2 * self.workers)
+        if opencv_threads is None:
+            opencv_threads = max(1, default_workers() // self.workers)
+        self.opencv_threads = opencv_threads
+        self._pool = None
+
+    def __enter__(self):
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.opencv_threads,)
+        )
+        return self
+
+    def __exit__(self, *exc):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._pool = None
+
+    def imap_unordered(self, func, items):
+        """
+        Aplica func(*args) a cada item (tupla de argumentos ou valor único)
+
+        Gera (item, resultado, erro) na ordem de conclusão; no máximo
+        max_in_flight tarefas ficam pendentes ao mesmo tempo.
+        """
+        items = iter(items)
+        pending = {}
+
+        def submit_next():
+            try:
+                item = next(items)
+            except StopIteration:
+                return False
+            args = item if isinstance(item, tuple) else (item,)
+            blocks = []
+            with rastreamento.span('empacotar', 'memoria_compartilhada'):
+                packed = _pack(args, blocks)
+            future = self._pool.submit(_run_task, func, packed)
+            pending[future] = (item, blocks)
+            return True
+
+        def release(blocks):
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+
+        while len(pending) < self.max_in_flight and submit_next():
+            pass
+
+        try:
+            while pending:
+                with rastreamento.span('espera', 'executor'):
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item, blocks = pending.pop(future)
+                    release(blocks)
+                    try:
+                        with rastreamento.span('desempacotar', 'memoria_compartilhada'):
+                            outcome = (item, _unpack(future.result(), unlink=True), None)
+                    except Exception as e:
+                        outcome = (item, None, e)
+                    submit_next()
+                    yield outcome
+        finally:
+            # Interrompido pelo consumidor: cancela as tarefas não iniciadas,
+            # espera as que já estão rodando e libera entradas e resultados
+            started = [future for future in pending if not future.cancel()]
+            wait(started)
+            for future in started:
+                try:
+                    _unpack(future.result(), unlink=True)
+                except Exception:
+                    pass
+            for _, blocks in pending.values():
+                release(blocks)
@@ -0,0 +1,73 @@
+"""
+Codificação de imagens para exibição na interface
+
+Em vez de enviar cada array em resolução de trabalho para st.image (que
+o recodifica a cada execução do script), a imagem é reduzida à largura da
+coluna em que aparece e codificada uma única vez em JPEG (ou PNG) com a
+qualidade configurada. Os bytes ficam no cache de artefatos, por versão da
+imagem e largura, e o st.image os repassa ao navegador sem recodificar.
+
+Configuração por variáveis de ambiente:
+    IMAGENS_EXIBICAO_FORMATO    'jpeg' (padrão) ou 'png'
+    IMAGENS_EXIBICAO_QUALIDADE  qualidade JPEG, 1-100 (padrão 85)
+
+WebP não é usado: o st.image só repassa JPEG e PNG sem recodificar.
+"""
+
+import os
+
+import cv2
+
+import artefatos
+import rastreamento
+
+# Largura máxima de conteúdo do Streamlit (2 × 730 px, telas de alta densidade)
+DISPLAY_MAX_WIDTH = 1460
+
+DISPLAY_FORMATS = ('jpeg', 'png')
+
+DISPLAY_FORMAT_ENV = 'IMAGENS_EXIBICAO_FORMATO'
+DISPLAY_QUALITY_ENV = 'IMAGENS_EXIBICAO_QUALIDADE'
+
+DISPLAY_FORMAT = os.environ.get(DISPLAY_FORMAT_ENV, 'jpeg').lower()
+DISPLAY_QUALITY = int(os.environ.get(DISPLAY_QUALITY_ENV, 85))
+
+if DISPLAY_FORMAT not in DISPLAY_FORMATS:
+    raise ValueError(f"Formato de exibição desconhecido: {DISPLAY_FORMAT}")
+
+
+def display_width(fraction=1.0):
+    """Largura em pixels de uma coluna que ocupa fraction da área de conteúdo"""
+    return max(1, round(DISPLAY_MAX_WIDTH * fraction))
+
+
+def encode_for_display(img, max_width=DISPLAY_MAX_WIDTH, fmt=None, quality=None):
+    """
+    Bytes de img reduzida (INTER_AREA) a no máximo max_width de largura e codificada
+
+    fmt é 'jpeg' ou 'png' (padrão: DISPLAY_FORMAT). O resultado fica em
+    cache enquanto img existir.
+    """
+    fmt = fmt or DISPLAY_FORMAT
+    quality = DISPLAY_QUALITY if quality is None else quality
+    if fmt not in DISPLAY_FORMATS:
+        raise ValueError(f"Formato de exibição desconhecido: {fmt}")
+
+    def compute():
+        with rastreamento.span('encode', 'exibicao', formato=fmt):
+            h, w = img.shape[:2]
+            out = img
+            if w > max_width:
+                out = cv2.resize(img, (max_width, max(1, round(h * max_width / w))),
+                                 interpolation=cv2.INTER_AREA)
+            if out.ndim == 3:
+                out = cv2.cvtColor(out, cv2.COLOR_RGB2BGR)
+            if fmt == 'jpeg':
+                ok, buf = cv2.imencode('.jpg', out, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            else:
+                ok, buf = cv2.imencode('.png', out, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        if not ok:
+            raise ValueError("Não foi possível codificar a imagem para exibição")
+        return buf.tobytes()
+
+    return artefatos.ARTIFACTS.get_or_compute(img, 'exibicao', (max_width, fmt, quality), compute)
@@ -0,0 +1,249 @@
+"""
+Grafo de operações com avaliação preguiçosa
+
+Um pipeline é descrito como um grafo de nós (operação, entradas, parâmetros)
+sem calcular nada; o cálculo só acontece em Graph.evaluate, quando o
+resultado vai ser exibido ou gravado.
+
+Subexpressões comuns são compartilhadas: nós iguais (mesma operação,
+entradas e parâmetros) são criados uma única vez em Graph.add, então, por
+exemplo, a imagem em tons de cinza usada pela proteção anti-oversharpening
+e pelo Laplaciano é calculada uma vez só. Conversões de ida e volta entre
+espaços de cor não são eliminadas: em uint8 elas perdem informação, e
+removê-las mudaria o resultado.
+
+Nós escolhidos podem ser memorizados em um ResultCache pela assinatura
+estrutural (conteúdo da entrada + operações e parâmetros até o nó): ao
+reavaliar um pipeline em que só um parâmetro final mudou, o prefixo
+inalterado vem do cache e apenas as etapas seguintes são recalculadas.
+
+Uso:
+    g = Graph()
+    src = g.source(img)
+    gray = g.add('rgb2gray', g.add('gaussian', src, sigma=1.0))
+    edges, = g.evaluate(g.add('canny', gray, threshold1=100, threshold2=200))
+"""
+
+import hashlib
+
+import cv2
+
+import artefatos
+import processamento as proc
+import rastreamento
+from cache import content_hash
+
+def _equalize_y(ycrcb):
+    out = ycrcb.copy()
+    cv2.insertChannel(cv2.equalizeHist(cv2.extractChannel(ycrcb, 0)), out, 0)
+    return out
+
+
+def _clahe_l(lab, clip_limit, tile_size):
+    clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(tile_size, tile_size))
+    out = lab.copy()
+    cv2.insertChannel(clahe.apply(cv2.extractChannel(lab, 0)), out, 0)
+    return out
+
+
+def _high_frequency(img, intensity):
+    blurred = cv2.GaussianBlur(img, (0, 0), 3)
+    return cv2.addWeighted(img, intensity, blurred, -(intensity - 1), 0)
+
+
+def _edge_density(edges):
+    return cv2.countNonZero(edges) / edges.size
+
+
+def _guard(density, value, cap):
+    """Limita value a cap quando a densidade de bordas indica oversharpening"""
+    return min(value, cap) if density > proc.OVERSHARPENING_EDGE_DENSITY else value
+
+
+# Operação -> função (entradas..., **parâmetros)
+OPS = {
+    # Tons de cinza e bordas vêm do cache de artefatos (compartilhado com métricas e análise)
+    'rgb2gray': artefatos.gray,
+    'rgb2lab': lambda img: cv2.cvtColor(img, cv2.COLOR_RGB2LAB),
+    'lab2rgb': lambda img: cv2.cvtColor(img, cv2.COLOR_LAB2RGB),
+    'rgb2ycrcb': lambda img: cv2.cvtColor(img, cv2.COLOR_RGB2YCrCb),
+    'ycrcb2rgb': lambda img: cv2.cvtColor(img, cv2.COLOR_YCrCb2RGB),
+    'merge_edges': proc.merge_edges,
+    'gaussian': proc.gaussian_blur,
+    'median': cv2.medianBlur,
+    'laplacian': proc.laplacian_edges,
+    'high_freq': _high_frequency,
+    'clahe_l': _clahe_l,
+    'equalize_y': _equalize_y,
+    'canny': artefatos.canny,
+    'edge_density': _edge_density,
+    'guard': _guard,
+}
+
+SOURCE = 'fonte'
+
+
+class Node:
+    """Nó do grafo: operação, entradas (nós) e parâmetros"""
+
+    __slots__ = ('op', 'inputs', 'params', 'value')
+
+    def __init__(self, op, inputs=(), params=(), value=None):
+        self.op = op
+        self.inputs = inputs
+        self.params = params
+        self.value = value
+
+    def __repr__(self):
+        args = ', '.join(f"{k}={v}" for k, v in self.params)
+        return f"Node({self.op}{', ' + args if args else ''})"
+
+
+class Graph:
+    """Construção e avaliação de grafos de operações"""
+
+    def __init__(self):
+        # Nós internados por (operação, ids das entradas, parâmetros)
+        self._nodes = {}
+
+    def source(self, img):
+        """Nó de entrada para o array img"""
+        key = (SOURCE, id(img))
+        node = self._nodes.get(key)
+        if node is None or node.value is not img:
+            node = self._nodes[key] = Node(SOURCE, value=img)
+        return node
+
+    def add(self, op, *inputs, **params):
+        """Nó op(*inputs, **params), reutilizando um nó idêntico se já existir"""
+        if op not in OPS:
+            raise ValueError(f"Operação desconhecida: {op}")
+        params = tuple(sorted(params.items()))
+        key = (op, tuple(id(n) for n in inputs), params)
+        node = self._nodes.get(key)
+        if node is None:
+            node = self._nodes[key] = Node(op, tuple(inputs), params)
+        return node
+
+    def signature(self, node, _memo=None):
+        """Hash estrutural de node: conteúdo das fontes, operações e parâmetros"""
+        memo = {} if _memo is None else _memo
+        sig = memo.get(id(node))
+        if sig is None:
+            if node.op == SOURCE:
+                sig = content_hash(node.value)
+            else:
+                inputs = tuple(self.signature(n, memo) for n in node.inputs)
+                sig = hashlib.blake2b(repr((node.op, node.params, inputs)).encode(),
+                                      digest_size=20).hexdigest()
+            memo[id(node)] = sig
+        return sig
+
+    def evaluate(self, *outputs, cache=None, cached=(), token=None, recorder=None):
+        """
+        Calcula os nós de saída e retorna seus valores
+
+        Cada nó é calculado uma única vez; resultados intermediários são
+        liberados assim que o último consumidor os utiliza. Com cache
+        (ResultCache), os nós em cached são lidos do cache quando presentes,
+        sem calcular suas entradas, e gravados nele quando calculados. Com
+        token (executor_fundo.CancelToken), o cancelamento é verificado
+        antes de cada nó. Com recorder (desempenho.StageRecorder), cada nó
+        calculado é medido como uma etapa com o nome da operação; com o
+        rastreamento ligado, cada nó também gera um intervalo no trace.
+        """
+        cached = list(cached) if cache is not None else []
+
+        sig_memo = {}
+        memo_keys = {id(n): 'grafo:' + self.signature(n, sig_memo) for n in cached}
+
+        order = []
+        consumers = {}
+        visited = set()
+        values = {}
+
+        def visit(node):
+            if id(node) in visited:
+                return
+            visited.add(id(node))
+            key = memo_keys.get(id(node))
+            if key is not None:
+                value = cache.get(key)
+                if value is not None:
+                    # Prefixo já calculado: as entradas não são visitadas
+                    values[id(node)] = value
+                    order.append(node)
+                    return
+            for n in node.inputs:
+                consumers[id(n)] = consumers.get(id(n), 0) + 1
+                visit(n)
+            order.append(node)
+
+        for node in outputs:
+            visit(node)
+
+        keep = {id(node) for node in outputs}
+        for node in order:
+            if id(node) in values:
+                continue
+            if node.op == SOURCE:
+                values[id(node)] = node.value
+                continue
+            if token is not None:
+                token.check()
+            args = [values[id(n)] for n in node.inputs]
+            with rastreamento.span(node.op, 'grafo'):
+                if recorder is not None:
+                    values[id(node)] = recorder.call(node.op, OPS[node.op], *args, **dict(node.params))
+                else:
+                    values[id(node)] = OPS[node.op](*args, **dict(node.params))
+            if id(node) in memo_keys:
+                cache.put(memo_keys[id(node)], values[id(node)])
+            for n in node.inputs:
+                consumers[id(n)] -= 1
+                if consumers[id(n)] == 0 and id(n) not in keep:
+                    del values[id(n)]
+
+        return [values[id(node)] for node in outputs]
+
+
+def hybrid_graph(graph, src, use_smoothing, sigma, use_clahe, clip_limit, tile_size,
+                 use_sharpening, sharp_method, weight, intensity):
+    """
+    Grafo do pipeline Suavização → CLAHE → Nitidez sobre o nó src
+
+    Retorna um dicionário com os nós 'result' e, com nitidez, 'density',
+    'weight' e 'intensity' (valores ajustados pela proteção anti-oversharpening).
+    Em 'stages' ficam as saídas intermediárias que valem a pena memorizar:
+    cada uma depende só dos parâmetros das etapas anteriores.
+    """
+    img = src
+    nodes = {'stages': []}
+
+    if use_smoothing:
+        img = graph.add('gaussian', img, sigma=sigma)
+        nodes['stages'].append(img)
+
+    if use_clahe:
+        lab = graph.add('clahe_l', graph.add('rgb2lab', img), clip_limit=clip_limit, tile_size=tile_size)
+        img = graph.add('lab2rgb', lab)
+        nodes['stages'].append(img)
+
+    if use_sharpening:
+        # Um único nó de tons de cinza serve à proteção e ao Laplaciano
+        gray = graph.add('rgb2gray', img)
+        density = graph.add('edge_density', graph.add('canny', gray, threshold1=100, threshold2=200))
+        nodes['density'] = density
+        nodes['weight'] = graph.add('guard', density, value=weight, cap=1.0)
+        nodes['intensity'] = graph.add('guard', density, value=intensity, cap=1.2)
+        nodes['stages'] += [gray, density]
+
+        if sharp_method == 'Laplaciano':
+            edges = graph.add('laplacian', gray)
+            nodes['stages'].append(edges)
+            img = graph.add('merge_edges', img, edges, nodes['weight'])
+        elif sharp_method == 'Alta Frequência':
+            img = graph.add('high_freq', img, nodes['intensity'])
+
+    nodes['result'] = img
+    return nodes
@@ -0,0 +1,138 @@
+"""
+Histórico de undo com compressão delta
+
+Em vez de uma cópia completa da imagem por alteração, cada estado é
+guardado como a diferença (XOR byte a byte) em relação ao estado anterior,
+comprimida com zlib. A cada KEYFRAME_INTERVAL estados (ou quando o formato
+da imagem muda) é guardado um quadro-chave completo, também comprimido, o
+que limita o número de diferenças aplicadas para reconstruir um estado.
+
+Pixels não alterados geram zeros na diferença, que comprimem quase a nada:
+a memória cresce com o tamanho da alteração e não com o tamanho da imagem,
+e o histórico não precisa de limite de profundidade.
+"""
+
+import zlib
+
+import numpy as np
+
+# Intervalo entre quadros-chave (máximo de diferenças aplicadas por reconstrução)
+KEYFRAME_INTERVAL = 8
+
+# Nível de compressão zlib (1 = mais rápido)
+COMPRESSION_LEVEL = 1
+
+
+class HistoryEntry:
+    """Registro de um estado: operação, formato e dados comprimidos"""
+
+    __slots__ = ('action', 'shape', 'dtype', 'keyframe', 'data')
+
+    def __init__(self, action, shape, dtype, keyframe, data):
+        self.action = action
+        self.shape = shape
+        self.dtype = dtype
+        self.keyframe = keyframe
+        self.data = data
+
+
+class UndoHistory:
+    """
+    Pilha de estados de imagem com quadros-chave e diferenças comprimidas
+
+    Uso:
+        history = UndoHistory()
+        history.push(img, "Nitidez: Laplaciano")
+        img, action = history.pop()
+    """
+
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL, level=COMPRESSION_LEVEL):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.level = level
+        self._entries = []
+        # Último estado reconstruído (evita replay a cada push consecutivo)
+        self._tip = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def push(self, img, action=None):
+        """Registra img como novo estado (com a operação que o antecede)"""
+        img = np.ascontiguousarray(img)
+        previous = None
+        if self._entries:
+            previous = self._tip if self._tip is not None else self._reconstruct(len(self._entries) - 1)
+
+        since_key = self._since_keyframe()
+        keyframe = (
+            previous is None
+            or previous.shape != img.shape
+            or previous.dtype != img.dtype
+            or since_key + 1 >= self.keyframe_interval
+        )
+        raw = img if keyframe else np.bitwise_xor(img, previous)
+        data = zlib.compress(raw.tobytes(), self.level)
+
+        self._entries.append(HistoryEntry(action, img.shape, img.dtype.str, keyframe, data))
+        self._tip = img.copy()
+
+    def pop(self):
+        """Remove o estado mais recente; retorna (imagem, operação)"""
+        if not self._entries:
+            raise IndexError("Histórico vazio")
+        img = self._tip if self._tip is not None else self._reconstruct(len(self._entries) - 1)
+        entry = self._entries.pop()
+        # O novo topo é reconstruído sob demanda no próximo push/pop
+        self._tip = None
+        return img, entry.action
+
+    def peek(self, index=-1):
+        """Reconstrói o estado de índice index sem removê-lo"""
+        if index < 0:
+            index += len(self._entries)
+        if not 0 <= index < len(self._entries):
+            raise IndexError("Índice fora do histórico")
+        if index == len(self._entries) - 1 and self._tip is not None:
+            return self._tip.copy()
+        return self._reconstruct(index)
+
+    def actions(self):
+        """Operações registradas, da mais antiga à mais recente"""
+        return [entry.action for entry in self._entries]
+
+    def nbytes(self):
+        """Bytes ocupados pelos dados comprimidos"""
+        return sum(len(entry.data) for entry in self._entries)
+
+    def raw_nbytes(self):
+        """Bytes que o histórico ocuparia com cópias completas"""
+        return sum(int(np.prod(e.shape)) * np.dtype(e.dtype).itemsize for e in self._entries)
+
+    def clear(self):
+        """Remove todos os estados"""
+        self._entries = []
+        self._tip = None
+
+    def _since_keyframe(self):
+        """Número de diferenças desde o último quadro-chave"""
+        count = 0
+        for entry in reversed(self._entries):
+            if entry.keyframe:
+                return count
+            count += 1
+        return count
+
+    def _decode(self, entry):
+        """Descomprime os dados de um registro"""
+        flat = np.frombuffer(zlib.decompress(entry.data), dtype=np.dtype(entry.dtype))
+        return flat.reshape(entry.shape)
+
+    def _reconstruct(self, index):
+        """Reconstrói o estado index a partir do quadro-chave anterior"""
+        start = index
+        while not self._entries[start].keyframe:
+            start -= 1
+        img = self._decode(self._entries[start]).copy()
+        for entry in self._entries[start + 1:index + 1]:
+            np.bitwise_xor(img, self._decode(entry), out=img)
+        return img
@@ -0,0 +1,141 @@
+"""
+Preview progressivo sobre pirâmide de resolução
+
+Ao mover um parâmetro, a operação é aplicada primeiro em um nível reduzido
+da pirâmide da imagem (1/2, 1/4, 1/8...), escolhido para caber no orçamento
+de latência segundo o tempo medido nas execuções anteriores. A versão em
+resolução completa é calculada em segundo plano e substitui o preview
+quando fica pronta. Um novo pedido torna obsoletos os anteriores: os ainda
+na fila não chegam a executar e resultados atrasados são descartados
+(executor_fundo, política "o mais recente vence").
+"""
+
+import time
+
+import cv2
+
+from executor_fundo import BackgroundExecutor
+
+# Orçamento de latência do primeiro preview (segundos)
+PREVIEW_BUDGET_S = 0.15
+
+# Fator de redução do primeiro preview sem medição anterior
+DEFAULT_SCALE = 4
+
+# Menor lado aceito para um nível da pirâmide
+MIN_LEVEL_SIDE = 64
+
+
+def build_pyramid(img, min_side=MIN_LEVEL_SIDE):
+    """Níveis [img, 1/2, 1/4, ...] (INTER_AREA) até o menor lado min_side"""
+    levels = [img]
+    while min(levels[-1].shape[:2]) // 2 >= min_side:
+        h, w = levels[-1].shape[:2]
+        levels.append(cv2.resize(levels[-1], (w // 2, h // 2), interpolation=cv2.INTER_AREA))
+    return levels
+
+
+class ProgressivePreview:
+    """
+    Preview em dois passos: nível reduzido imediato e refinamento em segundo plano
+
+    O refinamento é submetido ao canal channel de um BackgroundExecutor, o
+    que o torna cancelável e sujeito à política "o mais recente vence".
+
+    Uso:
+        preview = ProgressivePreview()
+        quick, scale = preview.render('nitidez', img, func)
+        ...
+        refined = preview.poll()   # None enquanto não estiver pronto
+    """
+
+    def __init__(self, executor=None, channel='preview', budget_s=PREVIEW_BUDGET_S):
+        self.budget_s = budget_s
+        self.channel = channel
+        self._owns_executor = executor is None
+        self._executor = executor if executor is not None else BackgroundExecutor(workers=1)
+        self._pyramid = (None, None)
+        # Segundos por pixel de cada operação (média móvel)
+        self._cost = {}
+
+    def _levels(self, img):
+        source, levels = self._pyramid
+        if source is not img:
+            levels = build_pyramid(img)
+            self._pyramid = (img, levels)
+        return levels
+
+    def _measure(self, op, pixels, seconds):
+        estimate = seconds / max(pixels, 1)
+        previous = self._cost.get(op)
+        self._cost[op] = estimate if previous is None else 0.5 * previous + 0.5 * estimate
+
+    def _choose_level(self, op, levels):
+        """Índice do maior nível cuja estimativa cabe no orçamento"""
+        cost = self._cost.get(op)
+        if cost is None:
+            default = DEFAULT_SCALE.bit_length() - 1
+            return min(default, len(levels) - 1)
+        for i, level in enumerate(levels):
+            if cost * level.shape[0] * level.shape[1] <= self.budget_s:
+                return i
+        return len(levels) - 1
+
+    def render(self, op, img, func, on_done=None):
+        """
+        Aplica func ao nível reduzido que cabe no orçamento e agenda o refinamento
+
+        Retorna (preview, escala), com escala = 1 quando já é a resolução
+        completa (nesse caso nada é agendado). on_done é associado à tarefa
+        de refinamento (ver BackgroundExecutor.completed).
+        """
+        # Refinamentos anteriores ficam obsoletos
+        self._executor.cancel(self.channel)
+
+        levels = self._levels(img)
+        index = self._choose_level(op, levels)
+        level = levels[index]
+
+        start = time.perf_counter()
+        quick = func(level)
+        self._measure(op, level.shape[0] * level.shape[1], time.perf_counter() - start)
+
+        if index > 0:
+            self._executor.submit(
+                self.channel, lambda token: self._refine(token, op, img, func),
+                on_done=on_done, label=op
+            )
+        return quick, 2 ** index
+
+    def _refine(self, token, op, img, func):
+        token.check()
+        start = time.perf_counter()
+        result = func(img)
+        self._measure(op, img.shape[0] * img.shape[1], time.perf_counter() - start)
+        return result
+
+    def pending(self):
+        """Há um refinamento em andamento ou pronto para ser lido"""
+        return self._executor.pending(self.channel)
+
+    def poll(self):
+        """
+        Resultado do refinamento atual se pronto (consumido na leitura), senão None
+
+        Exceções do refinamento são propagadas.
+        """
+        for _, result, error in self._executor.completed(self.channel):
+            if error is not None:
+                raise error
+            return result
+        return None
+
+    def cancel(self):
+        """Descarta o refinamento pendente"""
+        self._executor.cancel(self.channel)
+
+    def close(self):
+        """Cancela o refinamento (e encerra o executor próprio, se houver)"""
+        self.cancel()
+        if self._owns_executor:
+            self._executor.shutdown()
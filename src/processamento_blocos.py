@@ -0,0 +1,343 @@
+"""
+Processamento em blocos (tiles) para imagens maiores que a memória
+
+A imagem de origem é lida bloco a bloco (por exemplo, um .npy aberto com
+np.load(mmap_mode='r')) e cada bloco é lido com uma margem (halo) igual ao
+suporte do filtro. Como nas bordas reais da imagem o bloco termina na
+própria borda, o tratamento de borda do OpenCV é o mesmo da imagem inteira
+e o resultado costurado é idêntico ao processamento global, sem emendas.
+A saída é gravada em um .npy mapeado em memória, de modo que a memória
+usada depende apenas do tamanho do bloco e do número de workers.
+
+Execução:
+python processamento_blocos.py mosaico.npy saida.npy --filtro gaussiano:1.0 --filtro laplaciano:1.0 -j 4
+python processamento_blocos.py mosaico.npy saida.npy --filtro gaussiano:1.0 --filtro clahe:2.5:8 --filtro laplaciano:1.0
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import cv2
+
+import processamento as proc
+
+DEFAULT_TILE_SIZE = 1024
+COLUMN_ALIGN = 64
+CLAHE_BAND_BUDGET = 64 * 1024 * 1024
+CLAHE_BYTES_PER_PIXEL = 48
+
+TiledFilter = namedtuple('TiledFilter', ['name', 'halo', 'func'])
+TiledFilter.__doc__ = "Filtro aplicável por blocos: nome, margem necessária (px) e função img → img"
+
+
+def gaussian_filter(sigma):
+    """Suavização gaussiana (processamento.gaussian_blur); margem = raio do kernel"""
+    halo = int(proc.GAUSSIAN_TRUNCATE * sigma + 0.5)
+    return TiledFilter(f"Gaussiano σ={sigma}", halo, lambda img: proc.gaussian_blur(img, sigma))
+
+
+def median_filter(kernel):
+    """Filtro de mediana k×k; margem = k // 2"""
+    if kernel % 2 == 0:
+        kernel += 1
+    return TiledFilter(f"Mediana {kernel}×{kernel}", kernel // 2,
+                       lambda img: cv2.medianBlur(img, kernel))
+
+
+def laplacian_sharpen(weight):
+    """Nitidez Laplaciano 3×3 (processamento.sharpen); margem = 1"""
+    return TiledFilter(f"Laplaciano peso={weight}", 1,
+                       lambda img: proc.sharpen(img, 'Laplaciano', weight, 0, 1.0))
+
+
+def high_frequency_sharpen(intensity):
+    """Nitidez Alta Frequência (GaussianBlur σ=3, kernel 19×19); margem = 9"""
+    return TiledFilter(f"Alta Frequência intensidade={intensity}", 9,
+                       lambda img: proc.sharpen(img, 'Alta Frequência', 1.0, 0, intensity))
+
+
+ClaheStage = namedtuple('ClaheStage', ['name', 'clip_limit', 'tile_size'])
+ClaheStage.__doc__ = "Etapa CLAHE (duas passadas globais, não usa margem)"
+
+
+def clahe_stage(value):
+    """Etapa CLAHE a partir de 'clip' ou 'clip:grade' (ex.: '2.5:8')"""
+    clip, _, tiles = value.partition(':')
+    tiles = int(tiles or 8)
+    return ClaheStage(f"CLAHE clip={clip} grade={tiles}", float(clip), tiles)
+
+
+FILTERS = {
+    'gaussiano': lambda v: gaussian_filter(float(v)),
+    'mediana': lambda v: median_filter(int(v)),
+    'laplaciano': lambda v: laplacian_sharpen(float(v)),
+    'altafrequencia': lambda v: high_frequency_sharpen(float(v)),
+    'clahe': clahe_stage,
+}
+
+
+def parse_filter(spec):
+    """Converte 'nome:valor' (ex.: 'gaussiano:1.0') em TiledFilter ou ClaheStage"""
+    name, _, value = spec.partition(':')
+    if name not in FILTERS or not value:
+        raise ValueError(f"Filtro inválido: '{spec}' (use {', '.join(n + ':valor' for n in FILTERS)})")
+    return FILTERS[name](value)
+
+
+def iter_tiles(height, width, tile_size):
+    """Gera as janelas (r0, r1, c0, c1) que particionam a imagem"""
+    for r0 in range(0, height, tile_size):
+        for c0 in range(0, width, tile_size):
+            yield r0, min(r0 + tile_size, height), c0, min(c0 + tile_size, width)
+
+
+def _process_tile(src, dst, filters, halo, window):
+    """Lê o bloco com margem, aplica os filtros em sequência e grava o interior"""
+    r0, r1, c0, c1 = window
+    h, w = src.shape[:2]
+    top, bottom = max(0, r0 - halo), min(h, r1 + halo)
+    # Colunas alinhadas a COLUMN_ALIGN e com folga à direita: os laços SIMD
+    # do OpenCV percorrem cada coluna com o mesmo alinhamento da imagem
+    # inteira, o que mantém os filtros em ponto flutuante bit a bit iguais
+    left = max(0, (c0 - halo) // COLUMN_ALIGN * COLUMN_ALIGN)
+    right = min(w, c1 + halo + COLUMN_ALIGN)
+
+    tile = np.ascontiguousarray(src[top:bottom, left:right])
+    for f in filters:
+        tile = f.func(tile)
+    dst[r0:r1, c0:c1] = tile[r0 - top:r1 - top, c0 - left:c1 - left]
+
+
+def process_tiled(src, dst, filters, tile_size=DEFAULT_TILE_SIZE, workers=1):
+    """
+    Aplica filters (TiledFilter ou sequência deles) de src em dst, bloco a bloco
+
+    Em uma sequência de filtros a margem é a soma das margens individuais,
+    o que mantém o resultado idêntico à aplicação encadeada na imagem
+    inteira. Com workers > 1 os blocos são processados em threads (o OpenCV
+    libera o GIL); no máximo 2 × workers blocos ficam em memória.
+    """
+    if isinstance(filters, TiledFilter):
+        filters = [filters]
+    halo = sum(f.halo for f in filters)
+    windows = iter_tiles(src.shape[0], src.shape[1], tile_size)
+
+    if workers <= 1:
+        for window in windows:
+            _process_tile(src, dst, filters, halo, window)
+        return dst
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for window in windows:
+            pending.append(pool.submit(_process_tile, src, dst, filters, halo, window))
+            if len(pending) >= 2 * workers:
+                pending.pop(0).result()
+        for future in pending:
+            future.result()
+    return dst
+
+
+def _reflect101(index, size):
+    """Índices fora de [0, size) refletidos como BORDER_REFLECT_101"""
+    index = np.abs(index)
+    return np.where(index >= size, 2 * (size - 1) - index, index)
+
+
+def _clahe_geometry(height, width, tiles):
+    """
+    Tamanho do bloco CLAHE e da imagem estendida, como no cv2.createCLAHE
+
+    Se alguma dimensão não for múltipla do número de blocos, o OpenCV
+    estende a imagem (REFLECT_101) em tiles - (size % tiles) linhas e
+    colunas, inclusive na dimensão que já era múltipla.
+    """
+    if width % tiles == 0 and height % tiles == 0:
+        return height // tiles, width // tiles
+    ext_h = height + tiles - height % tiles
+    ext_w = width + tiles - width % tiles
+    return ext_h // tiles, ext_w // tiles
+
+
+def _band_rows(width, budget_bytes):
+    """Linhas por faixa para que os buffers da faixa caibam no orçamento"""
+    return max(1, budget_bytes // (width * CLAHE_BYTES_PER_PIXEL))
+
+
+def clahe_luts(src, clip_limit, tiles, budget_bytes=CLAHE_BAND_BUDGET):
+    """
+    1ª passada: histogramas do canal L por bloco da grade, em faixas de linhas
+
+    Retorna as LUTs (tiles × tiles × 256, uint8) e o tamanho do bloco, com o
+    mesmo recorte e redistribuição de histograma do OpenCV.
+    """
+    h, w = src.shape[:2]
+    tile_h, tile_w = _clahe_geometry(h, w, tiles)
+    cols = _reflect101(np.arange(tile_w * tiles), w)
+    col_tile = (np.arange(tile_w * tiles) // tile_w).astype(np.intp) * 256
+    hists = np.zeros((tiles, tiles * 256), dtype=np.int64)
+    step = _band_rows(tile_w * tiles, budget_bytes)
+
+    for ty in range(tiles):
+        for r0 in range(ty * tile_h, (ty + 1) * tile_h, step):
+            rows = _reflect101(np.arange(r0, min(r0 + step, (ty + 1) * tile_h)), h)
+            band = np.ascontiguousarray(src[rows.min():rows.max() + 1])
+            l = cv2.extractChannel(cv2.cvtColor(band, cv2.COLOR_RGB2LAB), 0)
+            l = l[rows - rows.min()][:, cols]
+            hists[ty] += np.bincount((col_tile + l).ravel(), minlength=tiles * 256)
+
+    hists = hists.reshape(tiles, tiles, 256)
+    area = tile_h * tile_w
+    limit = max(int(clip_limit * area / 256), 1) if clip_limit > 0 else 0
+    luts = np.empty((tiles, tiles, 256), dtype=np.uint8)
+    scale = np.float32(255.0 / area)
+
+    for ty in range(tiles):
+        for tx in range(tiles):
+            hist = hists[ty, tx]
+            if limit:
+                clipped = int(np.maximum(hist - limit, 0).sum())
+                hist = np.minimum(hist, limit) + clipped // 256
+                residual = clipped % 256
+                if residual:
+                    step_r = max(256 // residual, 1)
+                    hist[np.arange(0, 256, step_r)[:residual]] += 1
+            cdf = np.cumsum(hist).astype(np.float32) * scale
+            luts[ty, tx] = np.clip(np.rint(cdf), 0, 255)
+    return luts, (tile_h, tile_w)
+
+
+def clahe_tiled(src, dst, clip_limit, tile_size, budget_bytes=CLAHE_BAND_BUDGET):
+    """
+    CLAHE no canal L (como processamento.clahe_rgb) em duas passadas por faixas
+
+    A 1ª passada acumula os histogramas de cada bloco da grade tile_size ×
+    tile_size; a 2ª aplica as LUTs com a mesma interpolação bilinear entre
+    blocos vizinhos do OpenCV, sem emendas. A memória é limitada por
+    budget_bytes (buffers da faixa) e pelas LUTs (tile_size² × 256 bytes).
+    """
+    luts, (tile_h, tile_w) = clahe_luts(src, clip_limit, tile_size, budget_bytes)
+    h, w = src.shape[:2]
+
+    txf = np.arange(w, dtype=np.float32) * np.float32(1.0 / tile_w) - np.float32(0.5)
+    tx1 = np.floor(txf).astype(np.intp)
+    xa = (txf - tx1).astype(np.float32)
+    xa1 = np.float32(1.0) - xa
+    tx2 = np.minimum(tx1 + 1, tile_size - 1)
+    tx1 = np.maximum(tx1, 0)
+    inv_th = np.float32(1.0 / tile_h)
+
+    step = _band_rows(w, budget_bytes)
+    for r0 in range(0, h, step):
+        r1 = min(r0 + step, h)
+        lab = cv2.cvtColor(np.ascontiguousarray(src[r0:r1]), cv2.COLOR_RGB2LAB)
+        l = cv2.extractChannel(lab, 0)
+
+        tyf = np.arange(r0, r1, dtype=np.float32) * inv_th - np.float32(0.5)
+        ty1 = np.floor(tyf).astype(np.intp)
+        ya = (tyf - ty1).astype(np.float32)[:, None]
+        ya1 = np.float32(1.0) - ya
+        ty2 = np.minimum(ty1 + 1, tile_size - 1)[:, None]
+        ty1 = np.maximum(ty1, 0)[:, None]
+
+        top = luts[ty1, tx1, l] * xa1 + luts[ty1, tx2, l] * xa
+        bottom = luts[ty2, tx1, l] * xa1 + luts[ty2, tx2, l] * xa
+        res = top * ya1 + bottom * ya
+        cv2.insertChannel(np.clip(np.rint(res), 0, 255).astype(np.uint8), lab, 0)
+        dst[r0:r1] = cv2.cvtColor(lab, cv2.COLOR_LAB2RGB)
+    return dst
+
+
+def run_stages(src, output_path, stages, tile_size=DEFAULT_TILE_SIZE, workers=1):
+    """
+    Executa a sequência de etapas gravando em output_path (.npy)
+
+    Filtros com margem consecutivos são fundidos em uma única passada por
+    blocos; cada CLAHE é uma etapa própria. Resultados intermediários vão
+    para arquivos .npy temporários ao lado da saída.
+    """
+    groups = []
+    for stage in stages:
+        if isinstance(stage, TiledFilter) and groups and isinstance(groups[-1], list):
+            groups[-1].append(stage)
+        else:
+            groups.append([stage] if isinstance(stage, TiledFilter) else stage)
+
+    current, temps = src, []
+    try:
+        for i, group in enumerate(groups):
+            last = i == len(groups) - 1
+            path = output_path if last else f"{output_path}.etapa{i}.npy"
+            out = create_output(path, src.shape, src.dtype)
+            if isinstance(group, ClaheStage):
+                clahe_tiled(current, out, group.clip_limit, group.tile_size)
+            else:
+                process_tiled(current, out, group, tile_size=tile_size, workers=workers)
+            out.flush()
+            if not last:
+                temps.append(path)
+            current = out
+    finally:
+        for path in temps:
+            os.unlink(path)
+    return current
+
+
+def open_source(path):
+    """
+    Abre a imagem de origem
+
+    Arquivos .npy são mapeados em memória (leitura sob demanda, sem carregar
+    a imagem inteira); PNG/JPEG são decodificados por completo.
+    """
+    if path.lower().endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    with open(path, 'rb') as f:
+        return proc.decode_image(f.read())
+
+
+def create_output(path, shape, dtype=np.uint8):
+    """Cria a saída .npy mapeada em memória"""
+    return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+
+
+def main(argv=None):
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description="Aplica filtros por blocos em imagens maiores que a memória (saída .npy)"
+    )
+    parser.add_argument('entrada', help="Imagem de origem (.npy mapeado em memória, PNG ou JPEG)")
+    parser.add_argument('saida', help="Arquivo .npy de saída")
+    parser.add_argument('--filtro', action='append', required=True,
+                        help="Filtro nome:valor, na ordem de aplicação "
+                             "(gaussiano:σ, mediana:k, laplaciano:peso, altafrequencia:intensidade, "
+                             "clahe:clip[:grade])")
+    parser.add_argument('--bloco', type=int, default=DEFAULT_TILE_SIZE, help="Lado do bloco (px)")
+    parser.add_argument('-j', '--workers', type=int, default=1, help="Threads de processamento")
+    args = parser.parse_args(argv)
+
+    try:
+        filters = [parse_filter(spec) for spec in args.filtro]
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+
+    src = open_source(args.entrada)
+
+    start = time.perf_counter()
+    run_stages(src, args.saida, filters, tile_size=args.bloco, workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    megapixels = src.shape[0] * src.shape[1] / 1e6
+    print(f"✅ {' → '.join(f.name for f in filters)}: {src.shape[1]}×{src.shape[0]} "
+          f"em {elapsed:.2f} s ({megapixels / elapsed:.1f} MP/s) → {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
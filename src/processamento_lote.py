@@ -0,0 +1,326 @@
+"""
+Processamento em lote do pipeline híbrido
+
+Executa a cadeia Suavização → CLAHE → Nitidez (mesmos parâmetros e proteção
+anti-oversharpening da aba Híbrido) sobre um diretório ou padrão glob,
+gravando as imagens resultantes e as métricas de cada imagem em CSV e JSON.
+A execução é retomável: imagens já registradas no CSV são ignoradas.
+
+Cada imagem é identificada pelo caminho relativo à raiz da entrada (o
+diretório, ou a parte do padrão glob antes do primeiro curinga), com a
+extensão: a/x.jpg grava a/x.jpg.png, sem colidir com a/x.png nem com b/x.jpg.
+
+Execução:
+python processamento_lote.py ../imagens -o ../resultados
+python processamento_lote.py "../imagens/*.jpg" -o ../resultados --sem-clahe
+python processamento_lote.py ../imagens -o ../resultados -j 0   (todos os núcleos)
+python processamento_lote.py ../imagens -o ../resultados --cache ../.cache
+python processamento_lote.py ../imagens -o ../resultados --metricas amostrado
+python processamento_lote.py ../imagens -o ../resultados -j 4 --trace trace.json
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+
+import cv2
+
+import processamento as proc
+import rastreamento
+from cache import ResultCache
+from executor_paralelo import ParallelExecutor, default_workers
+from metricas import METRICS_MODES
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+METRICS_CSV = 'metricas.csv'
+METRICS_JSON = 'metricas.json'
+CSV_FIELDS = [
+    'arquivo', 'saida', 'PSNR', 'SSIM', 'LC', 'Edge_Sharpness',
+    'psnr_ok', 'ssim_ok', 'lc_ok', 'edge_ok', 'oversharpening', 'tecnicas'
+]
+
+
+def find_images(source):
+    """Lista as imagens de um diretório ou padrão glob, em ordem"""
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        paths = glob.glob(source)
+    return sorted(p for p in paths
+                  if os.path.isfile(p) and p.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def input_root(source):
+    """Raiz da entrada: o diretório, ou a parte do padrão glob sem curingas"""
+    if os.path.isdir(source):
+        return source
+    root = os.path.dirname(source)
+    while root and glob.has_magic(root):
+        root = os.path.dirname(root)
+    return root or os.curdir
+
+
+def relative_name(path, root):
+    """Identificador de uma imagem no lote: caminho relativo à raiz, com '/'"""
+    return os.path.relpath(path, root).replace(os.sep, '/')
+
+
+def output_name(name):
+    """Nome do arquivo de saída (PNG) para a imagem de identificador name"""
+    return name + '.png'
+
+
+def hybrid_params(args):
+    """Converte os argumentos da linha de comando nos parâmetros do pipeline"""
+    return {
+        'use_smoothing': not args.sem_suavizacao,
+        'sigma': args.sigma,
+        'use_clahe': not args.sem_clahe,
+        'clip_limit': args.clip,
+        'tile_size': args.tile,
+        'use_sharpening': not args.sem_nitidez,
+        'sharp_method': args.metodo,
+        'weight': args.peso,
+        'intensity': args.intensidade
+    }
+
+
+def process_file(path, params, native=False, cache=None, metrics_mode='completo'):
+    """
+    Carrega, normaliza e processa uma imagem; retorna (resultado, métricas, info)
+
+    Com cache (ResultCache), o resultado é memorizado pelo conteúdo do
+    arquivo, parâmetros, modo de resolução e modo das métricas
+    (metricas.METRICS_MODES).
+    """
+    with rastreamento.span('leitura', 'lote'), open(path, 'rb') as f:
+        data = f.read()
+
+    def compute():
+        if native:
+            normalized = proc.decode_image(data)
+        else:
+            normalized = proc.normalize_image(proc.decode_image(data, min_size=proc.NORMALIZED_SIZE))
+        result, info = proc.hybrid_pipeline(normalized, **params)
+        return result, proc.compute_metrics(normalized, result, mode=metrics_mode), info
+
+    if cache is None:
+        return compute()
+    return cache.get_or_compute(data, 'process_file', (sorted(params.items()), native, metrics_mode),
+                                compute)
+
+
+def write_image(path, img):
+    """Grava imagem RGB em disco (aceita caminhos com caracteres não ASCII)"""
+    with rastreamento.span('encode', 'lote'):
+        ok, buf = cv2.imencode(os.path.splitext(path)[1], cv2.cvtColor(img, cv2.COLOR_RGB2BGR))
+    if not ok:
+        raise ValueError(f"Não foi possível codificar {path}")
+    with rastreamento.span('gravação', 'lote'), open(path, 'wb') as f:
+        f.write(buf.tobytes())
+
+
+def load_done(csv_path):
+    """Lê as linhas já registradas no CSV de métricas (para retomar a execução)"""
+    if not os.path.exists(csv_path):
+        return []
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def metrics_row(name, out_name, metrics, info):
+    """Monta a linha do CSV de métricas para a imagem de identificador name"""
+    row = {
+        'arquivo': name,
+        'saida': out_name,
+        'oversharpening': info['oversharpening_risk'],
+        'tecnicas': ' → '.join(info['techniques'])
+    }
+    for key in ('PSNR', 'SSIM', 'LC', 'Edge_Sharpness'):
+        row[key] = f"{float(metrics[key]):.6f}"
+    for key in ('psnr_ok', 'ssim_ok', 'lc_ok', 'edge_ok'):
+        row[key] = bool(metrics[key])
+    return row
+
+
+def process_and_write(path, name, output_dir, params, native=False, cache_dir=None,
+                      metrics_mode='completo'):
+    """
+    Processa uma imagem, grava a saída e retorna (linha de métricas, acerto no cache)
+
+    name é o identificador da imagem no lote (relative_name).
+    """
+    # Só o nível em disco: é o que sobrevive entre execuções e processos
+    cache = ResultCache(max_bytes=0, disk_dir=cache_dir) if cache_dir else None
+    with rastreamento.span('imagem', 'lote', arquivo=name):
+        result, metrics, info = process_file(path, params, native, cache, metrics_mode)
+        out_name = output_name(name)
+        out_path = os.path.join(output_dir, out_name)
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        write_image(out_path, result)
+    return metrics_row(name, out_name, metrics, info), cache is not None and cache.misses == 0
+
+
+def _run_serial(paths, names, output_dir, params, native, cache_dir, metrics_mode):
+    """Executa o lote no processo atual; gera (caminho, (linha, acerto), erro)"""
+    for path in paths:
+        try:
+            yield path, process_and_write(path, names[path], output_dir, params, native, cache_dir,
+                                          metrics_mode), None
+        except Exception as e:
+            yield path, None, e
+
+
+def _run_parallel(paths, names, output_dir, params, native, cache_dir, metrics_mode, workers,
+                  max_in_flight):
+    """Executa o lote em um pool de processos; gera (caminho, (linha, acerto), erro)"""
+    with ParallelExecutor(workers=workers, max_in_flight=max_in_flight) as ex:
+        tasks = ((path, names[path], output_dir, params, native, cache_dir, metrics_mode)
+                 for path in paths)
+        for (path, *_), outcome, error in ex.imap_unordered(process_and_write, tasks):
+            yield path, outcome, error
+
+
+def run_batch(paths, output_dir, params, native=False, workers=1, max_in_flight=None,
+              cache_dir=None, metrics_mode='completo', root=None, log=print):
+    """
+    Processa a lista de imagens gravando saídas e métricas em output_dir
+
+    Com native=True as imagens são processadas na resolução original (sem a
+    normalização 512×512). Com workers > 1 as imagens são distribuídas em
+    um pool de processos. Com cache_dir os resultados ficam em um cache em
+    disco, reaproveitado por execuções com os mesmos arquivos e parâmetros.
+    metrics_mode escolhe o modo do motor de métricas ('completo', 'reduzido'
+    ou 'amostrado'). Imagens e linhas do CSV são identificadas pelo caminho
+    relativo a root (padrão: o diretório comum às imagens).
+    Retorna um dicionário com o número de imagens processadas, ignoradas,
+    com erro, acertos no cache e a vazão (imagens/s).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    csv_path = os.path.join(output_dir, METRICS_CSV)
+    rows = load_done(csv_path)
+    if root is None and paths:
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths])
+    names = {p: relative_name(p, root) for p in paths}
+    done = {row['arquivo'] for row in rows}
+    pending = [p for p in paths if names[p] not in done]
+
+    skipped = len(paths) - len(pending)
+    if skipped:
+        log(f"↷ {skipped} imagem(ns) já processada(s), ignorando")
+
+    if workers > 1 and len(pending) > 1:
+        outcomes = _run_parallel(pending, names, output_dir, params, native, cache_dir, metrics_mode,
+                                 workers, max_in_flight)
+    else:
+        outcomes = _run_serial(pending, names, output_dir, params, native, cache_dir, metrics_mode)
+
+    new_file = not os.path.exists(csv_path)
+    processed = 0
+    errors = 0
+    cache_hits = 0
+    start = time.perf_counter()
+
+    with open(csv_path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        if new_file:
+            writer.writeheader()
+
+        for i, (path, outcome, error) in enumerate(outcomes, 1):
+            if error is not None:
+                errors += 1
+                log(f"❌ [{i}/{len(pending)}] {path}: {error}")
+                continue
+
+            row, hit = outcome
+            cache_hits += hit
+            writer.writerow(row)
+            f.flush()
+            rows.append(row)
+            processed += 1
+
+            elapsed = time.perf_counter() - start
+            log(f"✅ [{i}/{len(pending)}] {names[path]} "
+                f"PSNR={row['PSNR'][:6]} SSIM={row['SSIM'][:5]} "
+                f"{'[cache] ' if hit else ''}({processed / elapsed:.2f} img/s)")
+
+    elapsed = time.perf_counter() - start
+    with open(os.path.join(output_dir, METRICS_JSON), 'w', encoding='utf-8') as f:
+        json.dump(rows, f, ensure_ascii=False, indent=2)
+
+    summary = {
+        'processadas': processed,
+        'ignoradas': skipped,
+        'erros': errors,
+        'cache_acertos': cache_hits,
+        'segundos': elapsed,
+        'imagens_por_segundo': processed / elapsed if elapsed > 0 else 0.0
+    }
+    log(f"📊 {processed} processada(s), {skipped} ignorada(s), {errors} erro(s), "
+        f"{cache_hits} do cache em {elapsed:.2f} s ({summary['imagens_por_segundo']:.2f} img/s)")
+    return summary
+
+
+def build_parser():
+    """Argumentos da linha de comando"""
+    d = proc.DEFAULT_PARAMS
+    parser = argparse.ArgumentParser(
+        description="Executa o pipeline híbrido sobre um diretório ou padrão glob de imagens"
+    )
+    parser.add_argument('entrada', help="Diretório ou padrão glob (ex.: '../imagens/*.jpg')")
+    parser.add_argument('-o', '--saida', default='resultados', help="Diretório de saída")
+    parser.add_argument('--sem-suavizacao', action='store_true', help="Desativa a suavização gaussiana")
+    parser.add_argument('--sigma', type=float, default=d['hybrid_sigma'])
+    parser.add_argument('--sem-clahe', action='store_true', help="Desativa o CLAHE")
+    parser.add_argument('--clip', type=float, default=d['hybrid_clip'])
+    parser.add_argument('--tile', type=int, choices=[4, 8, 16], default=d['hybrid_tile'])
+    parser.add_argument('--sem-nitidez', action='store_true', help="Desativa a nitidez")
+    parser.add_argument('--metodo', choices=['Laplaciano', 'Alta Frequência'],
+                        default=d['hybrid_sharp_method'])
+    parser.add_argument('--peso', type=float, default=d['hybrid_weight'])
+    parser.add_argument('--intensidade', type=float, default=d['hybrid_intensity'])
+    parser.add_argument('--resolucao-nativa', action='store_true',
+                        help="Processa na resolução original (sem normalizar para 512×512)")
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help=f"Processos paralelos (0 = todos os núcleos: {default_workers()})")
+    parser.add_argument('--fila', type=int, default=None,
+                        help="Máximo de imagens em andamento (padrão: 2 × workers)")
+    parser.add_argument('--cache', default=None,
+                        help="Diretório do cache de resultados (reaproveitado entre execuções)")
+    parser.add_argument('--metricas', choices=METRICS_MODES, default='completo',
+                        help="Modo das métricas: completo (exato), reduzido (rápido, sem margem de erro) "
+                             "ou amostrado (rápido, com margem de erro de 95%%)")
+    parser.add_argument('--trace', default=None,
+                        help="Grava um trace (formato Chrome trace-event) das etapas de cada processo/thread")
+    return parser
+
+
+def main(argv=None):
+    """Função principal"""
+    args = build_parser().parse_args(argv)
+    if args.sem_suavizacao and args.sem_clahe and args.sem_nitidez:
+        print("⚠️ Selecione pelo menos uma técnica!", file=sys.stderr)
+        return 2
+
+    paths = find_images(args.entrada)
+    if not paths:
+        print(f"⚠️ Nenhuma imagem encontrada em '{args.entrada}'", file=sys.stderr)
+        return 1
+
+    workers = args.workers or default_workers()
+    if args.trace:
+        rastreamento.enable(args.trace)
+    summary = run_batch(paths, args.saida, hybrid_params(args), native=args.resolucao_nativa,
+                        workers=workers, max_in_flight=args.fila, cache_dir=args.cache,
+                        metrics_mode=args.metricas, root=input_root(args.entrada))
+    if args.trace:
+        print(f"🧵 Trace gravado em {args.trace} (abrir em ui.perfetto.dev ou chrome://tracing)")
+    return 1 if summary['erros'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
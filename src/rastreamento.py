@@ -0,0 +1,139 @@
+"""
+Rastreamento de execução em formato Chrome trace-event (opcional)
+
+Com o rastreamento ligado, cada etapa instrumentada (decodificação, nós do
+pipeline híbrido como rgb2lab/clahe_l/lab2rgb/canny/laplacian/merge_edges,
+faixas do SSIM, codificação, memória compartilhada do lote) grava um
+intervalo com início, duração, processo e thread. O arquivo abre no
+Perfetto (ui.perfetto.dev) ou em chrome://tracing e mostra pontos de
+serialização e workers ociosos.
+
+Ligar:
+    IMAGENS_TRACE=trace.json streamlit run sistema_processamento_imagens_v3.py
+    python processamento_lote.py ../imagens -o ../resultados -j 4 --trace trace.json
+
+O arquivo usa o formato de array JSON sem o ']' final, que o formato
+permite: cada evento é acrescentado com uma única escrita (O_APPEND), então
+workers do lote gravam no mesmo arquivo sem combinar partes e o arquivo
+continua válido se o processo for interrompido. Os tempos vêm de
+time.perf_counter_ns (relógio monotônico comum aos processos).
+
+Desligado, span() não faz nada além de um teste.
+"""
+
+import json
+import multiprocessing
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_ENV = 'IMAGENS_TRACE'
+
+# Arquivo de saída (herdado pelos workers pela variável de ambiente)
+_path = os.environ.get(TRACE_ENV) or None
+_fd = None
+_fd_pid = None
+_named = set()
+_lock = threading.Lock()
+
+
+def _after_fork():
+    global _lock
+    # O lock pode ter sido copiado fechado por outra thread do pai
+    _lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def enabled():
+    """Se o rastreamento está ligado neste processo"""
+    return _path is not None
+
+
+def trace_path():
+    """Arquivo do trace (None com o rastreamento desligado)"""
+    return _path
+
+
+def enable(path):
+    """
+    Liga o rastreamento gravando em path (recriado), também nos processos
+    filhos criados depois
+    """
+    global _path, _fd, _fd_pid
+    path = os.path.abspath(path)
+    with _lock:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('[\n')
+        os.environ[TRACE_ENV] = path
+        _path = path
+        _fd = None
+        _fd_pid = None
+        _named.clear()
+
+
+def reset():
+    """Recria o arquivo do rastreamento ligado por IMAGENS_TRACE (início de uma execução)"""
+    if _path is not None:
+        enable(_path)
+
+
+def disable():
+    """Desliga o rastreamento neste processo e nos filhos criados depois"""
+    global _path, _fd
+    with _lock:
+        os.environ.pop(TRACE_ENV, None)
+        if _fd is not None and _fd_pid == os.getpid():
+            os.close(_fd)
+        _path = None
+        _fd = None
+
+
+def _write(event):
+    """Acrescenta um evento (chamado com _lock)"""
+    global _fd, _fd_pid
+    pid = os.getpid()
+    if _fd is None or _fd_pid != pid:
+        # Descritor próprio por processo (um worker criado por fork herda o do pai)
+        _fd = os.open(_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        _fd_pid = pid
+        if os.fstat(_fd).st_size == 0:
+            os.write(_fd, b'[\n')
+    os.write(_fd, (json.dumps(event, ensure_ascii=False) + ',\n').encode('utf-8'))
+
+
+def _name_thread(pid, tid):
+    """Eventos de metadados com os nomes do processo e da thread (uma vez cada)"""
+    if pid not in _named:
+        _named.add(pid)
+        _write({'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                'args': {'name': f"{multiprocessing.current_process().name} ({pid})"}})
+    if (pid, tid) not in _named:
+        _named.add((pid, tid))
+        _write({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                'args': {'name': threading.current_thread().name}})
+
+
+@contextmanager
+def span(name, cat='pipeline', **args):
+    """Grava o bloco como um intervalo name (categoria cat, argumentos args)"""
+    if _path is None:
+        yield
+        return
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        end = time.perf_counter_ns()
+        pid, tid = os.getpid(), threading.get_native_id()
+        event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': start / 1000,
+                 'dur': (end - start) / 1000, 'pid': pid, 'tid': tid}
+        if args:
+            event['args'] = args
+        with _lock:
+            if _path is not None:
+                _name_thread(pid, tid)
+                _write(event)
@@ -0,0 +1,167 @@
+"""
+Relatório PDF do processamento (independente do Streamlit)
+
+build_pdf_report recebe as imagens, as métricas e o histórico e devolve os
+bytes do PDF, sem ler st.session_state: a interface só repassa o estado da
+sessão, e o benchmark (benchmarks/bench_operacoes.py) mede a geração do
+relatório isoladamente. As miniaturas vão para o PDF como PNG em memória,
+sem arquivos temporários, em fluxos binários comprimidos (sem ASCII85).
+"""
+
+import io
+from datetime import datetime
+
+import cv2
+
+import desempenho
+import processamento as proc
+
+# Entradas do histórico no relatório e caracteres por entrada
+HISTORY_MAX_ENTRIES = 30
+HISTORY_MAX_CHARS = 100
+
+
+def _png_reader(img):
+    """ImageReader do reportlab com a prévia reduzida de img em PNG"""
+    from reportlab.lib.utils import ImageReader
+
+    ok, buf = cv2.imencode('.png', cv2.cvtColor(proc.make_proxy(img), cv2.COLOR_RGB2BGR))
+    if not ok:
+        raise ValueError("Não foi possível codificar a imagem para o relatório")
+    return ImageReader(io.BytesIO(buf.tobytes()))
+
+
+def build_pdf_report(original, processed, metrics, history, user, generated_at=None, performance=None):
+    """
+    Bytes do relatório PDF (imagens, métricas, conclusões, histórico e desempenho)
+
+    metrics pode ser None (relatório sem a seção de métricas); generated_at
+    é a data exibida no cabeçalho (padrão: agora). performance é o histórico
+    de desempenho (registros de desempenho.StageRecorder.timing com 'hora'
+    e 'acao', mais recente primeiro): cada operação sai com suas etapas.
+    """
+    # Importação tardia: o reportlab só é necessário ao gerar o PDF
+    from reportlab import rl_config
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    # Fluxos binários (só zlib): sem a extensão C do reportlab, a codificação
+    # ASCII85 das miniaturas em Python puro tomava ~95% do tempo do relatório
+    rl_config.useA85 = 0
+
+    generated_at = generated_at or datetime.now()
+
+    pdf_buffer = io.BytesIO()
+    c = canvas.Canvas(pdf_buffer, pagesize=A4)
+    width, height = A4
+
+    c.setFont("Helvetica-Bold", 20)
+    c.drawString(50, height - 50, "Relatório de Processamento de Imagens v3.0")
+
+    c.setFont("Helvetica", 10)
+    c.drawString(50, height - 70, f"Gerado em: {generated_at.strftime('%d/%m/%Y %H:%M:%S')}")
+    c.drawString(50, height - 85, f"Usuário: {user}")
+    c.line(50, height - 95, width - 50, height - 95)
+
+    y_position = height - 320
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(50, y_position + 20, "Análise Visual:")
+
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(50, y_position - 10, "Original:")
+    c.drawImage(_png_reader(original), 50, y_position - 190, width=200, height=200)
+
+    c.drawString(300, y_position - 10, "Processada:")
+    c.drawImage(_png_reader(processed), 300, y_position - 190, width=200, height=200)
+
+    y_position -= 230
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(50, y_position, "Métricas Quantitativas:")
+
+    c.setFont("Helvetica", 11)
+    y_position -= 25
+
+    if metrics:
+        m = metrics
+        metrics_lines = [
+            f"PSNR: {m['PSNR']:.2f} dB {'✓' if m['psnr_ok'] else '✗'} (Alvo: >= 30 dB)",
+            f"SSIM: {m['SSIM']:.3f} {'✓' if m['ssim_ok'] else '✗'} (Alvo: >= 0.85)",
+            f"LC: {m['LC']:.3f} {'✓' if m['lc_ok'] else '✗'} (Alvo: >= 0.12)",
+            f"Edge: {m['Edge_Sharpness']:.3f} {'✓' if m['edge_ok'] else '✗'} (Alvo: 0.03-0.25)"
+        ]
+
+        for line in metrics_lines:
+            c.drawString(70, y_position, line)
+            y_position -= 20
+
+        y_position -= 20
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(50, y_position, "Conclusões:")
+        c.setFont("Helvetica", 10)
+        y_position -= 20
+
+        all_ok = m['psnr_ok'] and m['ssim_ok'] and m['lc_ok'] and m['edge_ok']
+
+        if all_ok:
+            c.drawString(70, y_position, "✓ APROVADO - Métricas dentro dos parâmetros")
+            y_position -= 15
+            c.drawString(70, y_position, "Imagem atende critérios de qualidade")
+        else:
+            c.drawString(70, y_position, "✗ REPROVADO - Ajustes necessários:")
+            y_position -= 15
+            if not m['psnr_ok']:
+                c.drawString(85, y_position, "• PSNR baixo: reduzir intensidade")
+                y_position -= 12
+            if not m['ssim_ok']:
+                c.drawString(85, y_position, "• SSIM baixo: preservar estrutura")
+                y_position -= 12
+            if not m['lc_ok']:
+                c.drawString(85, y_position, "• LC baixo: aumentar CLAHE")
+                y_position -= 12
+            if not m['edge_ok']:
+                c.drawString(85, y_position, "• Edge fora: ajustar nitidez")
+                y_position -= 12
+
+    c.showPage()
+    y_position = height - 50
+
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(50, y_position, "Histórico:")
+
+    c.setFont("Helvetica", 8)
+    y_position -= 20
+
+    for entry in history[:HISTORY_MAX_ENTRIES]:
+        if y_position < 50:
+            c.showPage()
+            y_position = height - 50
+        c.drawString(60, y_position, entry[:HISTORY_MAX_CHARS])
+        y_position -= 12
+
+    if performance:
+        y_position -= 10
+        if y_position < 80:
+            c.showPage()
+            y_position = height - 50
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(50, y_position, "Desempenho por etapa:")
+        y_position -= 20
+
+        lines = []
+        for timing in performance[:HISTORY_MAX_ENTRIES]:
+            lines.append((60, "Helvetica-Bold", f"[{timing['hora']}] {timing['acao']}"))
+            lines.append((70, "Helvetica", desempenho.format_timing(timing)))
+            for record in timing['etapas']:
+                lines.append((70 + 10 * record['nivel'], "Helvetica",
+                              f"{record['etapa']}: {desempenho.format_timing(record)}"))
+
+        for x, font, text in lines:
+            if y_position < 50:
+                c.showPage()
+                y_position = height - 50
+            c.setFont(font, 8)
+            c.drawString(x, y_position, text[:HISTORY_MAX_CHARS])
+            y_position -= 12
+
+    c.save()
+    return pdf_buffer.getvalue()
@@ -16,18 +16,22 @@ Versão: 4.0
 import streamlit as st
 import numpy as np
 import cv2
-from PIL import Image
-import matplotlib.pyplot as plt
-from skimage import filters, exposure, metrics
-from skimage.filters import gaussian, median
-from scipy import ndimage
 import io
+import weakref
 from datetime import datetime
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import inch
-import tempfile
-import os
+
+import artefatos
+import desempenho
+import processamento as proc
+from analise import AnalysisCache, analysis_products, difference, metric_specs
+from relatorio import build_pdf_report
+import exibicao
+import rastreamento
+from armazenamento import MemmapImageStore
+from historico import UndoHistory
+from cache import cache_from_env
+from preview_progressivo import ProgressivePreview
+from executor_fundo import BackgroundExecutor
 
 # Configuração da página
 st.set_page_config(
@@ -57,6 +61,17 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_result_cache():
+    """Cache de resultados compartilhado entre as sessões do servidor"""
+    return cache_from_env()
+
+@st.cache_resource
+def start_tracing():
+    """Recria o arquivo de trace (IMAGENS_TRACE) uma vez por servidor"""
+    rastreamento.reset()
+    return rastreamento.enabled()
+
 # ============================================================================
 # CLASSE PRINCIPAL DO SISTEMA
 # ============================================================================
@@ -66,67 +81,106 @@ class ImageProcessingSystem:
     
     # Constantes e limiares
     MAX_FILE_SIZE_MB = 10
-    PSNR_THRESHOLD = 30.0
-    SSIM_THRESHOLD = 0.85
-    LC_MIN_THRESHOLD = 0.12
-    EDGE_MIN_THRESHOLD = 0.03
-    EDGE_MAX_THRESHOLD = 0.25
+    PSNR_THRESHOLD = proc.PSNR_THRESHOLD
+    SSIM_THRESHOLD = proc.SSIM_THRESHOLD
+    LC_MIN_THRESHOLD = proc.LC_MIN_THRESHOLD
+    EDGE_MIN_THRESHOLD = proc.EDGE_MIN_THRESHOLD
+    EDGE_MAX_THRESHOLD = proc.EDGE_MAX_THRESHOLD
     
     # Parâmetros padrão
-    DEFAULT_PARAMS = {
-        'filter_type': 'Gaussiano',
-        'kernel_radius': 3,
-        'sigma': 1.0,
-        'sharp_method': 'Laplaciano',
-        'weight': 1.0,
-        'threshold': 50,
-        'intensity': 1.2,
-        'contrast_method': 'CLAHE (Local)',
-        'clip_limit': 2.5,
-        'tile_size': 8,
-        'hybrid_sigma': 1.0,
-        'hybrid_clip': 2.5,
-        'hybrid_tile': 8,
-        'hybrid_sharp_method': 'Laplaciano',
-        'hybrid_weight': 1.0,
-        'hybrid_intensity': 1.2
-    }
+    DEFAULT_PARAMS = proc.DEFAULT_PARAMS
     
     def __init__(self):
         if 'initialized' not in st.session_state:
             st.session_state.original_image = None
+            st.session_state.original_size = None
             st.session_state.processed_image = None
             st.session_state.normalized_image = None
             st.session_state.preview_image = None
             st.session_state.versions = {}
             st.session_state.history = []
+            st.session_state.performance = []
             st.session_state.metrics = {}
             st.session_state.user = "Operador"
-            st.session_state.image_history = []
+            st.session_state.image_history = UndoHistory()
+            st.session_state.full_resolution = False
+            st.session_state.image_store = None
             st.session_state.initialized = True
     
     @staticmethod
-    def log_action(action):
-        """Registra ação no histórico"""
+    def log_action(action, timing=None):
+        """
+        Registra ação no histórico; com timing (desempenho.StageRecorder.timing),
+        também no histórico de desempenho
+        """
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         entry = f"[{timestamp}] {st.session_state.user}: {action}"
+        if timing is not None:
+            entry += f" [{timing['ms']:.0f} ms]"
+            st.session_state.performance.insert(0, dict(timing, hora=timestamp, acao=action))
         st.session_state.history.insert(0, entry)
     
     @staticmethod
-    def save_state():
-        """Salva estado atual para undo"""
+    def store_image(key, img, copy=False):
+        """
+        Buffer de sessão para img: com o armazenamento em disco ativo, a versão
+        mapeada em memória (arquivo próprio por chave); senão, img (ou cópia)
+
+        O buffer devolvido é somente leitura: as imagens da sessão nunca são
+        alteradas no próprio buffer, e o cache de artefatos as reconhece
+        pela identidade (artefatos.freeze).
+        """
+        store = st.session_state.get('image_store')
+        if store is not None and img is not None:
+            return store.put(key, img)
+        if copy and img is not None:
+            img = img.copy()
+        return artefatos.freeze(img)
+    
+    @staticmethod
+    def configure_store(enabled):
+        """Ativa/desativa o armazenamento em disco, migrando os buffers atuais"""
+        ss = st.session_state
+        old_store = ss.image_store
+        if enabled == (old_store is not None):
+            return
+        
+        ss.image_store = MemmapImageStore() if enabled else None
+        
+        def move(key, img):
+            # Sem armazenamento, traz o buffer de volta para a memória
+            if img is None or enabled:
+                return ImageProcessingSystem.store_image(key, img)
+            return artefatos.freeze(np.array(img))
+        
+        for key in ('original_image', 'normalized_image', 'processed_image', 'preview_image'):
+            ss[key] = move(key, ss[key])
+        ss.versions = {name: move(f"versao_{name}", img) for name, img in ss.versions.items()}
+        ss.pop('_proxy_cache', None)
+        
+        if old_store is not None:
+            old_store.close()
+    
+    @staticmethod
+    def save_state(action=None):
+        """Salva estado atual para undo (diferença comprimida em relação ao anterior)"""
         if st.session_state.processed_image is not None:
-            st.session_state.image_history.append(st.session_state.processed_image.copy())
-            if len(st.session_state.image_history) > 10:
-                st.session_state.image_history.pop(0)
+            st.session_state.image_history.push(st.session_state.processed_image, action)
     
     @staticmethod
     def undo_last_change():
         """Reverte última alteração"""
         if len(st.session_state.image_history) > 0:
-            st.session_state.processed_image = st.session_state.image_history.pop()
-            st.session_state.preview_image = st.session_state.processed_image.copy()
-            ImageProcessingSystem.log_action("Última alteração revertida")
+            restored, action = st.session_state.image_history.pop()
+            st.session_state.processed_image = ImageProcessingSystem.store_image(
+                'processed_image', restored
+            )
+            st.session_state.preview_image = ImageProcessingSystem.store_image(
+                'preview_image', restored, copy=True
+            )
+            ImageProcessingSystem.log_action(
+                f"Última alteração revertida ({action})" if action else "Última alteração revertida"
+            )
             return True
         return False
     
@@ -150,30 +204,177 @@ class ImageProcessingSystem:
         ImageProcessingSystem.log_action("Parâmetros restaurados aos padrões")
         return True
     
+    @staticmethod
+    def jobs():
+        """Executor de tarefas em segundo plano da sessão"""
+        if '_jobs' not in st.session_state:
+            st.session_state._jobs = BackgroundExecutor()
+        return st.session_state._jobs
+    
+    @staticmethod
+    def land_results():
+        """Aplica à sessão os resultados das tarefas concluídas; retorna quantos"""
+        outcomes = ImageProcessingSystem.jobs().completed()
+        for job, result, error in outcomes:
+            if error is not None:
+                st.error(f"❌ Erro em {job.label}: {str(error)}")
+            elif job.on_done is not None:
+                job.on_done(result)
+        return len(outcomes)
+    
+    @staticmethod
+    def progressive_preview():
+        """Preview progressivo da sessão (refinamento no canal 'preview')"""
+        if '_progressive' not in st.session_state:
+            st.session_state._progressive = ProgressivePreview(ImageProcessingSystem.jobs())
+        return st.session_state._progressive
+    
+    @staticmethod
+    def mark_live_change(group):
+        """Callback dos controles: registra o grupo alterado para o Preview ao vivo"""
+        st.session_state.live_change = group
+    
+    @staticmethod
+    def run_operation(op, label, params, func, on_done, final=False, live=False):
+        """
+        func(img) sobre a imagem de trabalho, via cache, em segundo plano
+
+        on_done(resultado, timing) é chamado no script quando a tarefa termina
+        (timing: medição da operação; None no Preview ao vivo). O
+        Aplicar usa o canal 'aplicar'; o Preview, o canal 'preview' (um novo
+        pedido cancela o anterior). No Preview ao vivo o nível reduzido é
+        calculado na hora e o refinamento segue em segundo plano.
+        """
+        cache = get_result_cache()
+        
+        def compute(img):
+            return cache.get_or_compute(img, op, params, lambda: func(img))
+        
+        img = ImageProcessingSystem.working_image(final)
+        if live and not final:
+            preview, _ = ImageProcessingSystem.progressive_preview().render(op, img, compute, on_done)
+            on_done(preview)
+        else:
+            ImageProcessingSystem.jobs().submit(
+                'aplicar' if final else 'preview',
+                lambda token: desempenho.measure(label, lambda recorder: compute(img), img),
+                on_done=lambda outcome: on_done(*outcome), label=label
+            )
+    
+    @staticmethod
+    def apply_busy():
+        """Impede um novo Aplicar enquanto o anterior não termina (a entrada seria a imagem antiga)"""
+        if ImageProcessingSystem.jobs().pending('aplicar'):
+            st.info("⏳ Aguarde a operação em andamento")
+            return True
+        return False
+    
+    @staticmethod
+    def get_proxy(img):
+        """
+        Proxy reduzido de img para exibição/preview (em cache por imagem)
+
+        O cache guarda só o proxy e uma referência fraca à imagem: imagens
+        substituídas são liberadas e sua entrada sai do cache.
+        """
+        cache = st.session_state.setdefault('_proxy_cache', {})
+        key = id(img)
+        cached = cache.get(key)
+        if cached is not None and cached[0]() is img:
+            return cached[1]
+        proxy = artefatos.freeze(proc.make_proxy(img))
+        
+        def forget(ref):
+            if cache.get(key, (None,))[0] is ref:
+                del cache[key]
+        
+        try:
+            ref = weakref.ref(img, forget)
+        except TypeError:
+            return proxy
+        if len(cache) >= 4:
+            cache.pop(next(iter(cache)))
+        cache[key] = (ref, proxy)
+        return proxy
+    
+    @staticmethod
+    def display_image(img):
+        """Imagem a exibir: no modo nativo, o proxy reduzido"""
+        if st.session_state.full_resolution:
+            return ImageProcessingSystem.get_proxy(img)
+        return img
+    
+    @staticmethod
+    def show_image(img, caption=None, fraction=1.0, fmt=None):
+        """
+        Exibe img reduzida à largura da coluna (fraction da área de conteúdo),
+        codificada uma única vez por versão da imagem (ver exibicao.py)
+        """
+        fmt = fmt or exibicao.DISPLAY_FORMAT
+        data = exibicao.encode_for_display(img, exibicao.display_width(fraction), fmt)
+        st.image(data, caption=caption, output_format=fmt.upper(), use_container_width=True)
+    
+    @staticmethod
+    def analysis_products():
+        """Produtos da aba Análise, recalculados só quando as imagens mudam"""
+        ss = st.session_state
+        original, processed = ss.normalized_image, ss.processed_image
+        # No modo nativo, diferença e bordas usam os proxies de exibição
+        original_view = ImageProcessingSystem.display_image(original)
+        processed_view = ImageProcessingSystem.display_image(processed)
+        cache = ss.setdefault('_analysis_cache', AnalysisCache())
+        return cache.get_or_compute(
+            (original, processed, original_view, processed_view),
+            lambda: analysis_products(original, processed, original_view, processed_view)
+        )
+    
+    @staticmethod
+    def working_image(final):
+        """
+        Entrada das operações: a imagem atual completa no Aplicar e, no modo
+        de resolução nativa, o proxy reduzido no Preview
+        """
+        img = st.session_state.processed_image
+        if st.session_state.full_resolution and not final:
+            return ImageProcessingSystem.get_proxy(img)
+        return img
+    
     @staticmethod
     def load_image(uploaded_file):
-        """Carrega e normaliza imagem para 512x512px"""
+        """Carrega e normaliza imagem para 512x512px (ou mantém a resolução nativa)"""
         try:
             file_size_mb = uploaded_file.size / (1024 * 1024)
             if file_size_mb > ImageProcessingSystem.MAX_FILE_SIZE_MB:
                 st.error(f"❌ Arquivo muito grande ({file_size_mb:.2f} MB). Máximo: {ImageProcessingSystem.MAX_FILE_SIZE_MB} MB")
                 return False
             
-            file_bytes = np.asarray(bytearray(uploaded_file.read()), dtype=np.uint8)
-            img = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR)
-            
-            if img is None:
-                st.error("❌ Não foi possível carregar a imagem.")
-                return False
-            
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            st.session_state.original_image = img.copy()
-            st.session_state.normalized_image = cv2.resize(img, (512, 512), interpolation=cv2.INTER_LANCZOS4)
-            st.session_state.processed_image = st.session_state.normalized_image.copy()
-            st.session_state.preview_image = st.session_state.normalized_image.copy()
-            st.session_state.image_history = []
-            
-            ImageProcessingSystem.log_action(f"Imagem '{uploaded_file.name}' carregada ({file_size_mb:.2f} MB)")
+            store_image = ImageProcessingSystem.store_image
+            data = uploaded_file.getbuffer()
+            header = proc.image_header(data)
+            # Fora do modo nativo, JPEGs grandes já são decodificados reduzidos
+            min_size = None if st.session_state.full_resolution else proc.NORMALIZED_SIZE
+            recorder = desempenho.StageRecorder()
+            with recorder.stage("carregamento") as total:
+                img = recorder.call("decodificação", proc.decode_image, data, min_size=min_size)
+                normalized = img
+                if not st.session_state.full_resolution:
+                    normalized = recorder.call("normalização", proc.normalize_image, img)
+                desempenho.set_output(total, normalized)
+            st.session_state.original_size = header[1:] if header else img.shape[1::-1]
+            st.session_state.original_image = store_image('original_image', img, copy=True)
+            st.session_state.normalized_image = store_image('normalized_image', normalized)
+            st.session_state.processed_image = store_image(
+                'processed_image', st.session_state.normalized_image, copy=True
+            )
+            st.session_state.preview_image = store_image(
+                'preview_image', st.session_state.normalized_image, copy=True
+            )
+            st.session_state.image_history.clear()
+            ImageProcessingSystem.jobs().cancel()
+            
+            ImageProcessingSystem.log_action(
+                f"Imagem '{uploaded_file.name}' carregada ({file_size_mb:.2f} MB)", recorder.timing()
+            )
             st.success(f"✅ Imagem carregada com sucesso! ({file_size_mb:.2f} MB)")
             return True
             
@@ -182,32 +383,33 @@ class ImageProcessingSystem:
             return False
     
     @staticmethod
-    def apply_preprocessing(filter_type, kernel_radius, sigma):
+    def apply_preprocessing(filter_type, kernel_radius, sigma, final=False, live=False):
         """Aplica filtros de pré-processamento"""
         try:
             if st.session_state.processed_image is None:
                 st.warning("⚠️ Carregue uma imagem primeiro!")
                 return False
             
-            if sigma < 0.5 or sigma > 2.0:
-                st.error("❌ Sigma deve estar entre 0.5 e 2.0")
+            if final and ImageProcessingSystem.apply_busy():
                 return False
             
             if kernel_radius % 2 == 0:
                 kernel_radius += 1
             
-            img = st.session_state.processed_image.copy()
-            
-            if filter_type == 'Gaussiano':
-                filtered = np.zeros_like(img, dtype=np.float64)
-                for i in range(3):
-                    filtered[:,:,i] = gaussian(img[:,:,i], sigma=sigma, preserve_range=True)
-                filtered = np.clip(filtered, 0, 255).astype(np.uint8)
-            elif filter_type == 'Mediana':
-                filtered = cv2.medianBlur(img, kernel_radius)
-            
-            st.session_state.preview_image = filtered
-            ImageProcessingSystem.log_action(f"Pré-processamento: {filter_type}, raio={kernel_radius}, sigma={sigma}")
+            def done(filtered, timing=None):
+                st.session_state.preview_image = ImageProcessingSystem.store_image('preview_image', filtered)
+                if not live:
+                    ImageProcessingSystem.log_action(
+                        f"Pré-processamento: {filter_type}, raio={kernel_radius}, sigma={sigma}", timing
+                    )
+                if final:
+                    ImageProcessingSystem.confirm_preview()
+            
+            ImageProcessingSystem.run_operation(
+                'preprocess', "pré-processamento", (filter_type, kernel_radius, sigma),
+                lambda img: proc.preprocess(img, filter_type, kernel_radius, sigma),
+                done, final, live
+            )
             return True
                 
         except Exception as e:
@@ -215,39 +417,28 @@ class ImageProcessingSystem:
             return False
     
     @staticmethod
-    def apply_sharpening(method, weight, threshold, intensity):
+    def apply_sharpening(method, weight, threshold, intensity, final=False, live=False):
         """Aplica métodos de realce de nitidez"""
         try:
             if st.session_state.processed_image is None:
                 st.warning("⚠️ Carregue uma imagem primeiro!")
                 return False
             
-            img = st.session_state.processed_image.copy()
-            gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
-            
-            if method == 'Laplaciano':
-                laplacian = cv2.Laplacian(gray, cv2.CV_64F, ksize=3)
-                laplacian = np.uint8(np.absolute(laplacian))
-                sharpened = np.zeros_like(img)
-                for i in range(3):
-                    sharpened[:,:,i] = cv2.addWeighted(img[:,:,i], 1.0, laplacian, weight, 0)
-                
-            elif method == 'Sobel':
-                sobelx = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
-                sobely = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
-                sobel = np.sqrt(sobelx**2 + sobely**2)
-                sobel = np.uint8(sobel)
-                _, sobel = cv2.threshold(sobel, threshold, 255, cv2.THRESH_BINARY)
-                sharpened = np.zeros_like(img)
-                for i in range(3):
-                    sharpened[:,:,i] = cv2.addWeighted(img[:,:,i], 1.0, sobel, weight, 0)
-                
-            elif method == 'Alta Frequência':
-                blurred = cv2.GaussianBlur(img, (0, 0), 3)
-                sharpened = cv2.addWeighted(img, intensity, blurred, -(intensity-1), 0)
+            if final and ImageProcessingSystem.apply_busy():
+                return False
             
-            st.session_state.preview_image = np.clip(sharpened, 0, 255).astype(np.uint8)
-            ImageProcessingSystem.log_action(f"Nitidez: {method}, peso={weight}")
+            def done(sharpened, timing=None):
+                st.session_state.preview_image = ImageProcessingSystem.store_image('preview_image', sharpened)
+                if not live:
+                    ImageProcessingSystem.log_action(f"Nitidez: {method}, peso={weight}", timing)
+                if final:
+                    ImageProcessingSystem.confirm_preview()
+            
+            ImageProcessingSystem.run_operation(
+                'sharpen', "nitidez", (method, weight, threshold, intensity),
+                lambda img: proc.sharpen(img, method, weight, threshold, intensity),
+                done, final, live
+            )
             return True
                 
         except Exception as e:
@@ -255,38 +446,39 @@ class ImageProcessingSystem:
             return False
     
     @staticmethod
-    def apply_contrast_enhancement(method, clip_limit, tile_size):
+    def apply_contrast_enhancement(method, clip_limit, tile_size, final=False, live=False):
         """Aplica realce de contraste"""
         try:
             if st.session_state.processed_image is None:
                 st.warning("⚠️ Carregue uma imagem primeiro!")
                 return False
             
-            if clip_limit < 2.0 or clip_limit > 3.0:
-                st.error("❌ Clip limit deve estar entre 2.0 e 3.0")
+            if final and ImageProcessingSystem.apply_busy():
                 return False
             
-            img = st.session_state.processed_image.copy()
-            
-            if method == 'CLAHE (Local)':
-                lab = cv2.cvtColor(img, cv2.COLOR_RGB2LAB)
-                l, a, b = cv2.split(lab)
-                clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(tile_size, tile_size))
-                l = clahe.apply(l)
-                lab = cv2.merge([l, a, b])
-                enhanced = cv2.cvtColor(lab, cv2.COLOR_LAB2RGB)
-                st.session_state.versions['local'] = enhanced.copy()
+            def done(enhanced, timing=None):
+                st.session_state.preview_image = ImageProcessingSystem.store_image('preview_image', enhanced)
+                if live:
+                    return
+                
+                if method == 'CLAHE (Local)':
+                    st.session_state.versions['local'] = ImageProcessingSystem.store_image(
+                        'versao_local', enhanced, copy=True
+                    )
+                elif method == 'Equalização Global':
+                    st.session_state.versions['global'] = ImageProcessingSystem.store_image(
+                        'versao_global', enhanced, copy=True
+                    )
                 
-            elif method == 'Equalização Global':
-                ycrcb = cv2.cvtColor(img, cv2.COLOR_RGB2YCrCb)
-                y, cr, cb = cv2.split(ycrcb)
-                y = cv2.equalizeHist(y)
-                ycrcb = cv2.merge([y, cr, cb])
-                enhanced = cv2.cvtColor(ycrcb, cv2.COLOR_YCrCb2RGB)
-                st.session_state.versions['global'] = enhanced.copy()
-            
-            st.session_state.preview_image = enhanced
-            ImageProcessingSystem.log_action(f"Contraste: {method}, clip={clip_limit}")
+                ImageProcessingSystem.log_action(f"Contraste: {method}, clip={clip_limit}", timing)
+                if final:
+                    ImageProcessingSystem.confirm_preview()
+            
+            ImageProcessingSystem.run_operation(
+                'enhance_contrast', "contraste", (method, clip_limit, tile_size),
+                lambda img: proc.enhance_contrast(img, method, clip_limit, tile_size),
+                done, final, live
+            )
             return True
                 
         except Exception as e:
@@ -306,68 +498,36 @@ class ImageProcessingSystem:
                 st.warning("⚠️ Selecione pelo menos uma técnica!")
                 return False
             
-            img = st.session_state.normalized_image.copy()
-            techniques_used = []
-            
-            # Suavização
-            if use_smoothing:
-                smoothed = np.zeros_like(img, dtype=np.float64)
-                for i in range(3):
-                    smoothed[:,:,i] = gaussian(img[:,:,i], sigma=sigma, preserve_range=True)
-                img = np.clip(smoothed, 0, 255).astype(np.uint8)
-                techniques_used.append(f"Suavização (σ={sigma})")
-            
-            # CLAHE
-            if use_clahe:
-                lab = cv2.cvtColor(img, cv2.COLOR_RGB2LAB)
-                l, a, b = cv2.split(lab)
-                clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(tile_size, tile_size))
-                l = clahe.apply(l)
-                lab = cv2.merge([l, a, b])
-                img = cv2.cvtColor(lab, cv2.COLOR_LAB2RGB)
-                techniques_used.append(f"CLAHE (clip={clip_limit})")
-            
-            # Verificar oversharpening
-            adjusted_weight = weight
-            adjusted_intensity = intensity
-            oversharpening_risk = False
-            
-            if use_sharpening:
-                gray_img = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
-                edges_before = cv2.Canny(gray_img, 100, 200)
-                edge_density = np.sum(edges_before > 0) / edges_before.size
-                
-                if edge_density > 0.20:
-                    adjusted_weight = min(weight, 1.0)
-                    adjusted_intensity = min(intensity, 1.2)
-                    oversharpening_risk = True
-                
-                gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+            if ImageProcessingSystem.apply_busy():
+                return False
+            
+            params = (use_smoothing, sigma, use_clahe, clip_limit, tile_size,
+                      use_sharpening, sharp_method, weight, intensity)
+            img = st.session_state.normalized_image
+            cache = get_result_cache()
+            
+            def run(token):
+                return desempenho.measure("pipeline híbrido", lambda recorder: cache.get_or_compute(
+                    img, 'hybrid_pipeline', params,
+                    lambda: proc.hybrid_pipeline(img, *params, stage_cache=cache, token=token,
+                                                 recorder=recorder)
+                ), img)
+            
+            def done(outcome):
+                (result, info), timing = outcome
+                ImageProcessingSystem.save_state("Pipeline híbrido")
+                st.session_state.processed_image = ImageProcessingSystem.store_image('processed_image', result)
+                st.session_state.preview_image = st.session_state.processed_image
                 
-                if sharp_method == 'Laplaciano':
-                    laplacian = cv2.Laplacian(gray, cv2.CV_64F, ksize=3)
-                    laplacian = np.uint8(np.absolute(laplacian))
-                    sharpened = np.zeros_like(img)
-                    for i in range(3):
-                        sharpened[:,:,i] = cv2.addWeighted(img[:,:,i], 1.0, laplacian, adjusted_weight, 0)
-                    img = sharpened
-                elif sharp_method == 'Alta Frequência':
-                    blurred = cv2.GaussianBlur(img, (0, 0), 3)
-                    img = cv2.addWeighted(img, adjusted_intensity, blurred, -(adjusted_intensity-1), 0)
+                log_msg = f"Pipeline híbrido: {' → '.join(info['techniques'])}"
+                if info['oversharpening_risk']:
+                    log_msg += f" [Ajustado: {weight}→{info['adjusted_weight']}]"
+                    st.warning("⚠️ Risco de oversharpening! Parâmetros ajustados.")
                 
-                techniques_used.append(f"Nitidez {sharp_method}")
+                ImageProcessingSystem.log_action(log_msg, timing)
+                st.success("✅ Pipeline híbrido aplicado!")
             
-            result = np.clip(img, 0, 255).astype(np.uint8)
-            st.session_state.processed_image = result
-            st.session_state.preview_image = result
-            
-            log_msg = f"Pipeline híbrido: {' → '.join(techniques_used)}"
-            if oversharpening_risk:
-                log_msg += f" [Ajustado: {weight}→{adjusted_weight}]"
-                st.warning("⚠️ Risco de oversharpening! Parâmetros ajustados.")
-            
-            ImageProcessingSystem.log_action(log_msg)
-            st.success("✅ Pipeline híbrido aplicado!")
+            ImageProcessingSystem.jobs().submit('aplicar', run, on_done=done, label="pipeline híbrido")
             return True
             
         except Exception as e:
@@ -378,8 +538,10 @@ class ImageProcessingSystem:
     def confirm_preview():
         """Confirma preview"""
         if st.session_state.preview_image is not None:
-            ImageProcessingSystem.save_state()
-            st.session_state.processed_image = st.session_state.preview_image.copy()
+            ImageProcessingSystem.save_state("Preview confirmado")
+            st.session_state.processed_image = ImageProcessingSystem.store_image(
+                'processed_image', st.session_state.preview_image, copy=True
+            )
             ImageProcessingSystem.log_action("Preview confirmado")
             st.success("✅ Aplicado!")
             return True
@@ -393,33 +555,22 @@ class ImageProcessingSystem:
                 st.warning("⚠️ Carregue e processe uma imagem!")
                 return False
             
-            original = st.session_state.normalized_image.astype(np.float64)
-            processed = st.session_state.processed_image.astype(np.float64)
-            
-            mse = np.mean((original - processed) ** 2)
-            psnr = 100 if mse == 0 else 20 * np.log10(255.0 / np.sqrt(mse))
+            original = st.session_state.normalized_image
+            processed = st.session_state.processed_image
+            mode = st.session_state.get('metrics_mode', 'completo')
             
-            ssim = metrics.structural_similarity(original, processed, channel_axis=2, data_range=255.0)
+            def done(outcome):
+                metrics, timing = outcome
+                st.session_state.metrics = metrics
+                ImageProcessingSystem.log_action("Métricas calculadas", timing)
+                st.success("✅ Métricas calculadas!")
             
-            gray_processed = cv2.cvtColor(st.session_state.processed_image, cv2.COLOR_RGB2GRAY)
-            lc = np.std(gray_processed) / (np.mean(gray_processed) + 1e-10)
+            def run(token):
+                return desempenho.measure("métricas", lambda recorder: proc.compute_metrics(
+                    original, processed, token=token, mode=mode, recorder=recorder
+                ), processed)
             
-            edges = cv2.Canny(gray_processed, 100, 200)
-            edge_sharpness = np.sum(edges > 0) / edges.size
-            
-            st.session_state.metrics = {
-                'PSNR': psnr,
-                'SSIM': ssim,
-                'LC': lc,
-                'Edge_Sharpness': edge_sharpness,
-                'psnr_ok': psnr >= ImageProcessingSystem.PSNR_THRESHOLD,
-                'ssim_ok': ssim >= ImageProcessingSystem.SSIM_THRESHOLD,
-                'lc_ok': lc >= ImageProcessingSystem.LC_MIN_THRESHOLD,
-                'edge_ok': ImageProcessingSystem.EDGE_MIN_THRESHOLD <= edge_sharpness <= ImageProcessingSystem.EDGE_MAX_THRESHOLD
-            }
-            
-            ImageProcessingSystem.log_action("Métricas calculadas")
-            st.success("✅ Métricas calculadas!")
+            ImageProcessingSystem.jobs().submit('metricas', run, on_done=done, label="métricas")
             return True
                 
         except Exception as e:
@@ -434,110 +585,14 @@ class ImageProcessingSystem:
                 st.warning("⚠️ Processe uma imagem primeiro!")
                 return None
             
-            pdf_buffer = io.BytesIO()
-            c = canvas.Canvas(pdf_buffer, pagesize=A4)
-            width, height = A4
-            
-            c.setFont("Helvetica-Bold", 20)
-            c.drawString(50, height - 50, "Relatório de Processamento de Imagens v3.0")
-            
-            c.setFont("Helvetica", 10)
-            c.drawString(50, height - 70, f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
-            c.drawString(50, height - 85, f"Usuário: {st.session_state.user}")
-            c.line(50, height - 95, width - 50, height - 95)
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_orig:
-                cv2.imwrite(tmp_orig.name, cv2.cvtColor(st.session_state.normalized_image, cv2.COLOR_RGB2BGR))
-                temp_orig_path = tmp_orig.name
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_proc:
-                cv2.imwrite(tmp_proc.name, cv2.cvtColor(st.session_state.processed_image, cv2.COLOR_RGB2BGR))
-                temp_proc_path = tmp_proc.name
-            
-            y_position = height - 320
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(50, y_position + 20, "Análise Visual:")
+            ss = st.session_state
+            pdf_data, timing = desempenho.measure("relatório PDF", lambda recorder: build_pdf_report(
+                ss.normalized_image, ss.processed_image, ss.metrics, ss.history, ss.user,
+                performance=ss.performance
+            ))
             
-            c.setFont("Helvetica-Bold", 11)
-            c.drawString(50, y_position - 10, "Original:")
-            c.drawImage(temp_orig_path, 50, y_position - 190, width=200, height=200)
-            
-            c.drawString(300, y_position - 10, "Processada:")
-            c.drawImage(temp_proc_path, 300, y_position - 190, width=200, height=200)
-            
-            y_position -= 230
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(50, y_position, "Métricas Quantitativas:")
-            
-            c.setFont("Helvetica", 11)
-            y_position -= 25
-            
-            if st.session_state.metrics:
-                m = st.session_state.metrics
-                metrics_lines = [
-                    f"PSNR: {m['PSNR']:.2f} dB {'✓' if m['psnr_ok'] else '✗'} (Alvo: >= 30 dB)",
-                    f"SSIM: {m['SSIM']:.3f} {'✓' if m['ssim_ok'] else '✗'} (Alvo: >= 0.85)",
-                    f"LC: {m['LC']:.3f} {'✓' if m['lc_ok'] else '✗'} (Alvo: >= 0.12)",
-                    f"Edge: {m['Edge_Sharpness']:.3f} {'✓' if m['edge_ok'] else '✗'} (Alvo: 0.03-0.25)"
-                ]
-                
-                for line in metrics_lines:
-                    c.drawString(70, y_position, line)
-                    y_position -= 20
-                
-                y_position -= 20
-                c.setFont("Helvetica-Bold", 14)
-                c.drawString(50, y_position, "Conclusões:")
-                c.setFont("Helvetica", 10)
-                y_position -= 20
-                
-                all_ok = m['psnr_ok'] and m['ssim_ok'] and m['lc_ok'] and m['edge_ok']
-                
-                if all_ok:
-                    c.drawString(70, y_position, "✓ APROVADO - Métricas dentro dos parâmetros")
-                    y_position -= 15
-                    c.drawString(70, y_position, "Imagem atende critérios de qualidade")
-                else:
-                    c.drawString(70, y_position, "✗ REPROVADO - Ajustes necessários:")
-                    y_position -= 15
-                    if not m['psnr_ok']:
-                        c.drawString(85, y_position, "• PSNR baixo: reduzir intensidade")
-                        y_position -= 12
-                    if not m['ssim_ok']:
-                        c.drawString(85, y_position, "• SSIM baixo: preservar estrutura")
-                        y_position -= 12
-                    if not m['lc_ok']:
-                        c.drawString(85, y_position, "• LC baixo: aumentar CLAHE")
-                        y_position -= 12
-                    if not m['edge_ok']:
-                        c.drawString(85, y_position, "• Edge fora: ajustar nitidez")
-                        y_position -= 12
-            
-            c.showPage()
-            y_position = height - 50
-            
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(50, y_position, "Histórico:")
-            
-            c.setFont("Helvetica", 8)
-            y_position -= 20
-            
-            for entry in st.session_state.history[:30]:
-                if y_position < 50:
-                    c.showPage()
-                    y_position = height - 50
-                c.drawString(60, y_position, entry[:100])
-                y_position -= 12
-            
-            c.save()
-            
-            os.unlink(temp_orig_path)
-            os.unlink(temp_proc_path)
-            
-            ImageProcessingSystem.log_action("PDF gerado")
-            
-            pdf_buffer.seek(0)
-            return pdf_buffer.getvalue()
+            ImageProcessingSystem.log_action("PDF gerado", timing)
+            return pdf_data
                 
         except Exception as e:
             st.error(f"❌ Erro ao gerar PDF: {str(e)}")
@@ -547,11 +602,27 @@ class ImageProcessingSystem:
 # INTERFACE PRINCIPAL
 # ============================================================================
 
+@st.fragment(run_every=0.25)
+def job_watcher():
+    """Verifica periodicamente as tarefas em segundo plano e atualiza a página quando terminam"""
+    if ImageProcessingSystem.land_results():
+        st.rerun()
+    running = ImageProcessingSystem.jobs().running()
+    if running:
+        labels = ", ".join(f"{label} ({elapsed:.1f} s)" for _, label, elapsed in running)
+        st.caption(f"⏳ Em andamento: {labels}")
+    elif not ImageProcessingSystem.jobs().pending():
+        # Nada pendente: rerun completo encerra a verificação periódica
+        st.rerun()
+
 def main():
     """Função principal"""
     
     sistema = ImageProcessingSystem()
     
+    # Resultados de tarefas em segundo plano concluídas desde o último rerun
+    ImageProcessingSystem.land_results()
+    
     st.title("🖼️ Sistema de Processamento de Imagens v3.0")
     st.markdown("### Análise e realce avançado com métricas quantitativas")
     
@@ -566,11 +637,25 @@ def main():
         st.info(f"""
         **Versão:** 2.0
         **Formatos:** PNG, JPEG
-        **Resolução:** 512×512px
+        **Resolução:** {'Nativa' if st.session_state.full_resolution else '512×512px'}
         **Limite:** {ImageProcessingSystem.MAX_FILE_SIZE_MB} MB
         **Status:** 🟢 Online
         """)
         
+        cache_stats = get_result_cache().stats()
+        st.caption(
+            f"🗃️ Cache: {cache_stats['acertos_memoria'] + cache_stats['acertos_disco']} acerto(s), "
+            f"{cache_stats['falhas']} falha(s), {cache_stats['entradas']} resultado(s), "
+            f"{cache_stats['bytes_memoria'] / 2**20:.1f} MB"
+        )
+        artifact_stats = artefatos.ARTIFACTS.stats()
+        st.caption(
+            f"🧩 Artefatos: {artifact_stats['acertos']} acerto(s), {artifact_stats['entradas']} item(ns), "
+            f"{artifact_stats['bytes'] / 2**20:.1f} MB"
+        )
+        if start_tracing():
+            st.caption(f"🧵 Rastreamento ativo: {rastreamento.trace_path()}")
+        
         st.divider()
         
         st.header("🎯 Critérios")
@@ -595,6 +680,19 @@ def main():
             type=['png', 'jpg', 'jpeg']
         )
         
+        st.toggle(
+            "🔬 Resolução nativa",
+            key="full_resolution",
+            help="Mantém a resolução original; o Preview usa um proxy reduzido e o Aplicar processa a imagem completa. Recarregue a imagem após alterar."
+        )
+        
+        use_store = st.toggle(
+            "💾 Buffers em disco (memmap)",
+            key="use_image_store",
+            help="Guarda original, processada, preview e versões em arquivos mapeados em memória, liberando RAM do servidor."
+        )
+        ImageProcessingSystem.configure_store(use_store)
+        
         if uploaded_file is not None:
             if st.button("🚀 Carregar", type="primary"):
                 if ImageProcessingSystem.load_image(uploaded_file):
@@ -605,11 +703,16 @@ def main():
             col1, col2 = st.columns(2)
             
             with col1:
-                st.image(st.session_state.original_image, caption="Original", use_container_width=True)
-                st.caption(f"{st.session_state.original_image.shape[1]}×{st.session_state.original_image.shape[0]}")
+                ImageProcessingSystem.show_image(ImageProcessingSystem.display_image(st.session_state.original_image), "Original", 0.5)
+                original_size = st.session_state.get('original_size') or st.session_state.original_image.shape[1::-1]
+                st.caption("{}×{}".format(*original_size))
             
             with col2:
-                st.image(st.session_state.normalized_image, caption="Normalizada (512×512)", use_container_width=True)
+                working = st.session_state.normalized_image
+                if st.session_state.full_resolution:
+                    ImageProcessingSystem.show_image(ImageProcessingSystem.display_image(working), f"Nativa ({working.shape[1]}×{working.shape[0]})", 0.5)
+                else:
+                    ImageProcessingSystem.show_image(working, "Normalizada (512×512)", 0.5)
                 st.caption("Pronta para processamento")
     
     # TAB 2: PROCESSAMENTO
@@ -638,6 +741,21 @@ def main():
                 if st.button("📊 Calcular Métricas", type="primary", use_container_width=True):
                     ImageProcessingSystem.calculate_metrics()
             
+            st.toggle(
+                "⚡ Preview ao vivo",
+                key="live_preview",
+                help="Atualiza o preview a cada ajuste: primeiro em resolução reduzida, depois refinado em segundo plano."
+            )
+            st.selectbox(
+                "📏 Modo das métricas",
+                ['completo', 'reduzido', 'amostrado'],
+                key="metrics_mode",
+                help="completo: exato; reduzido: imagem reduzida, sem margem de erro (SSIM/PSNR em geral otimistas, até +0.26 no SSIM; só para comparar parâmetros); amostrado: janelas aleatórias com margem de erro de 95%."
+            )
+            live_change = st.session_state.pop('live_change', None)
+            if not st.session_state.get('live_preview'):
+                live_change = None
+            
             st.divider()
             
             col_controls, col_preview = st.columns([1, 1])
@@ -647,21 +765,27 @@ def main():
                     filter_type = st.selectbox(
                         "Tipo", 
                         ["Gaussiano", "Mediana"],
-                        key="filter_type"
+                        key="filter_type",
+                        on_change=ImageProcessingSystem.mark_live_change,
+                        args=("prep",)
                     )
                     
                     kernel_radius = st.slider(
                         "Raio", 1, 9, 
                         st.session_state.get('kernel_radius', ImageProcessingSystem.DEFAULT_PARAMS['kernel_radius']), 
                         2,
-                        key="kernel_radius"
+                        key="kernel_radius",
+                        on_change=ImageProcessingSystem.mark_live_change,
+                        args=("prep",)
                     )
                     
                     sigma = st.slider(
                         "Sigma", 0.5, 2.0, 
                         st.session_state.get('sigma', ImageProcessingSystem.DEFAULT_PARAMS['sigma']), 
                         0.1,
-                        key="sigma"
+                        key="sigma",
+                        on_change=ImageProcessingSystem.mark_live_change,
+                        args=("prep",)
                     )
                     
                     col1, col2 = st.columns(2)
@@ -670,34 +794,43 @@ def main():
                             ImageProcessingSystem.apply_preprocessing(filter_type, kernel_radius, sigma)
                     with col2:
                         if st.button("✅ Aplicar", key="app_prep", use_container_width=True):
-                            if ImageProcessingSystem.apply_preprocessing(filter_type, kernel_radius, sigma):
-                                ImageProcessingSystem.confirm_preview()
+                            ImageProcessingSystem.apply_preprocessing(filter_type, kernel_radius, sigma, final=True)
+                    if live_change == "prep":
+                        ImageProcessingSystem.apply_preprocessing(filter_type, kernel_radius, sigma, live=True)
                 
                 with st.expander("🔹 2. Nitidez"):
                     sharp_method = st.selectbox(
                         "Método", 
                         ["Laplaciano", "Sobel", "Alta Frequência"],
-                        key="sharp_method"
+                        key="sharp_method",
+                        on_change=ImageProcessingSystem.mark_live_change,
+                        args=("sharp",)
                     )
                     
                     weight = st.slider(
                         "Peso", 0.1, 3.0, 
                         st.session_state.get('weight', ImageProcessingSystem.DEFAULT_PARAMS['weight']), 
                         0.1,
-                        key="weight"
+                        key="weight",
+                        on_change=ImageProcessingSystem.mark_live_change,
+                        args=("sharp",)
                     )
                     
                     threshold = st.slider(
                         "Limiar", 10, 200, 
                         st.session_state.get('threshold', ImageProcessingSystem.DEFAULT_PARAMS['threshold']),
-                        key="threshold"
+                        key="threshold",
+                        on_change=ImageProcessingSystem.mark_live_change,
+                        args=("sharp",)
                     )
                     
                     intensity = st.slider(
                         "Intensidade", 1.0, 1.5, 
                         st.session_state.get('intensity', ImageProcessingSystem.DEFAULT_PARAMS['intensity']), 
                         0.1,
-                        key="intensity"
+                        key="intensity",
+                        on_change=ImageProcessingSystem.mark_live_change,
+                        args=("sharp",)
                     )
                     
                     col1, col2 = st.columns(2)
@@ -706,28 +839,35 @@ def main():
                             ImageProcessingSystem.apply_sharpening(sharp_method, weight, threshold, intensity)
                     with col2:
                         if st.button("✅ Aplicar", key="app_sharp", use_container_width=True):
-                            if ImageProcessingSystem.apply_sharpening(sharp_method, weight, threshold, intensity):
-                                ImageProcessingSystem.confirm_preview()
+                            ImageProcessingSystem.apply_sharpening(sharp_method, weight, threshold, intensity, final=True)
+                    if live_change == "sharp":
+                        ImageProcessingSystem.apply_sharpening(sharp_method, weight, threshold, intensity, live=True)
                 
                 with st.expander("🔹 3. Contraste"):
                     contrast_method = st.selectbox(
                         "Método", 
                         ["CLAHE (Local)", "Equalização Global"],
-                        key="contrast_method"
+                        key="contrast_method",
+                        on_change=ImageProcessingSystem.mark_live_change,
+                        args=("cont",)
                     )
                     
                     clip_limit = st.slider(
                         "Clip Limit", 2.0, 3.0, 
                         st.session_state.get('clip_limit', ImageProcessingSystem.DEFAULT_PARAMS['clip_limit']), 
                         0.1,
-                        key="clip_limit"
+                        key="clip_limit",
+                        on_change=ImageProcessingSystem.mark_live_change,
+                        args=("cont",)
                     )
                     
                     tile_size = st.select_slider(
                         "Tile Size", 
                         options=[4, 8, 16], 
                         value=st.session_state.get('tile_size', ImageProcessingSystem.DEFAULT_PARAMS['tile_size']),
-                        key="tile_size"
+                        key="tile_size",
+                        on_change=ImageProcessingSystem.mark_live_change,
+                        args=("cont",)
                     )
                     
                     col1, col2 = st.columns(2)
@@ -736,8 +876,9 @@ def main():
                             ImageProcessingSystem.apply_contrast_enhancement(contrast_method, clip_limit, tile_size)
                     with col2:
                         if st.button("✅ Aplicar", key="app_cont", use_container_width=True):
-                            if ImageProcessingSystem.apply_contrast_enhancement(contrast_method, clip_limit, tile_size):
-                                ImageProcessingSystem.confirm_preview()
+                            ImageProcessingSystem.apply_contrast_enhancement(contrast_method, clip_limit, tile_size, final=True)
+                    if live_change == "cont":
+                        ImageProcessingSystem.apply_contrast_enhancement(contrast_method, clip_limit, tile_size, live=True)
             
             with col_preview:
                 st.subheader("📺 Visualização")
@@ -748,21 +889,25 @@ def main():
                     with preview_tab1:
                         col1, col2 = st.columns(2)
                         with col1:
-                            st.image(st.session_state.processed_image, caption="Atual", use_container_width=True)
+                            ImageProcessingSystem.show_image(ImageProcessingSystem.display_image(st.session_state.processed_image), "Atual", 0.25)
                         with col2:
-                            st.image(st.session_state.preview_image, caption="Preview", use_container_width=True)
+                            ImageProcessingSystem.show_image(ImageProcessingSystem.display_image(st.session_state.preview_image), "Preview", 0.25)
                     
                     with preview_tab2:
-                        st.image(st.session_state.preview_image, caption="Preview", use_container_width=True)
+                        ImageProcessingSystem.show_image(ImageProcessingSystem.display_image(st.session_state.preview_image), "Preview", 0.5)
                     
                     with preview_tab3:
-                        diff = np.abs(st.session_state.processed_image.astype(np.float32) - 
-                                     st.session_state.preview_image.astype(np.float32))
-                        st.image(diff.astype(np.uint8), caption="Diferença", use_container_width=True)
-                        st.caption(f"Média: {np.mean(diff):.2f} | Máxima: {np.max(diff):.2f}")
+                        current_view = ImageProcessingSystem.display_image(st.session_state.processed_image)
+                        preview_view = ImageProcessingSystem.display_image(st.session_state.preview_image)
+                        diff_cache = st.session_state.setdefault('_preview_diff', AnalysisCache())
+                        diff, diff_mean, diff_max = diff_cache.get_or_compute(
+                            (current_view, preview_view), lambda: difference(current_view, preview_view)
+                        )
+                        ImageProcessingSystem.show_image(diff, "Diferença", 0.5)
+                        st.caption(f"Média: {diff_mean:.2f} | Máxima: {diff_max:.2f}")
                 else:
                     st.info("👆 Clique em Preview para visualizar")
-                    st.image(st.session_state.processed_image, caption="Atual", use_container_width=True)
+                    ImageProcessingSystem.show_image(ImageProcessingSystem.display_image(st.session_state.processed_image), "Atual", 0.5)
     
     # TAB 3: ANÁLISE
     with tab3:
@@ -775,9 +920,9 @@ def main():
             col1, col2 = st.columns(2)
             
             with col1:
-                st.image(st.session_state.normalized_image, caption="Original", use_container_width=True)
+                ImageProcessingSystem.show_image(ImageProcessingSystem.display_image(st.session_state.normalized_image), "Original", 0.5)
             with col2:
-                st.image(st.session_state.processed_image, caption="Processada", use_container_width=True)
+                ImageProcessingSystem.show_image(ImageProcessingSystem.display_image(st.session_state.processed_image), "Processada", 0.5)
             
             if 'global' in st.session_state.versions and 'local' in st.session_state.versions:
                 st.divider()
@@ -785,54 +930,34 @@ def main():
                 col1, col2 = st.columns(2)
                 
                 with col1:
-                    st.image(st.session_state.versions['global'], caption="Global", use_container_width=True)
+                    ImageProcessingSystem.show_image(ImageProcessingSystem.display_image(st.session_state.versions['global']), "Global", 0.5)
                 with col2:
-                    st.image(st.session_state.versions['local'], caption="Local", use_container_width=True)
+                    ImageProcessingSystem.show_image(ImageProcessingSystem.display_image(st.session_state.versions['local']), "Local", 0.5)
             
             st.divider()
             st.subheader("📈 Detalhes")
             
-            diff = np.abs(st.session_state.normalized_image.astype(np.float32) - 
-                         st.session_state.processed_image.astype(np.float32))
+            products = ImageProcessingSystem.analysis_products()
             
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                st.image(diff.astype(np.uint8), caption="Diferença", use_container_width=True)
+                ImageProcessingSystem.show_image(products['diff'], "Diferença", 1 / 3)
             
             with col2:
-                gray_orig = cv2.cvtColor(st.session_state.normalized_image, cv2.COLOR_RGB2GRAY)
-                edges_orig = cv2.Canny(gray_orig, 100, 200)
-                st.image(edges_orig, caption="Bordas Original", use_container_width=True)
+                ImageProcessingSystem.show_image(products['edges_original'], "Bordas Original", 1 / 3, fmt='png')
             
             with col3:
-                gray_proc = cv2.cvtColor(st.session_state.processed_image, cv2.COLOR_RGB2GRAY)
-                edges_proc = cv2.Canny(gray_proc, 100, 200)
-                st.image(edges_proc, caption="Bordas Processada", use_container_width=True)
+                ImageProcessingSystem.show_image(products['edges_processed'], "Bordas Processada", 1 / 3, fmt='png')
             
             st.divider()
             st.subheader("📊 Histogramas")
+            col1, col2 = st.columns(2)
             
-            fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 5))
-            
-            for i, color in enumerate(['red', 'green', 'blue']):
-                hist = cv2.calcHist([st.session_state.normalized_image], [i], None, [256], [0, 256])
-                ax1.plot(hist, color=color, alpha=0.7, label=color.upper())
-            ax1.set_title('Original', fontweight='bold')
-            ax1.set_xlim([0, 256])
-            ax1.legend()
-            ax1.grid(alpha=0.3)
-            
-            for i, color in enumerate(['red', 'green', 'blue']):
-                hist = cv2.calcHist([st.session_state.processed_image], [i], None, [256], [0, 256])
-                ax2.plot(hist, color=color, alpha=0.7, label=color.upper())
-            ax2.set_title('Processada', fontweight='bold')
-            ax2.set_xlim([0, 256])
-            ax2.legend()
-            ax2.grid(alpha=0.3)
-            
-            plt.tight_layout()
-            st.pyplot(fig)
+            with col1:
+                st.vega_lite_chart(products['hist_original'], use_container_width=True)
+            with col2:
+                st.vega_lite_chart(products['hist_processed'], use_container_width=True)
     
     # TAB 4: MÉTRICAS
     with tab4:
@@ -861,6 +986,12 @@ def main():
                 st.metric(f"{'✅' if m['edge_ok'] else '⚠️'} Edge", f"{m['Edge_Sharpness']:.3f}")
                 st.caption(f"Alvo: {ImageProcessingSystem.EDGE_MIN_THRESHOLD}-{ImageProcessingSystem.EDGE_MAX_THRESHOLD}")
             
+            if m.get('modo', 'completo') != 'completo':
+                margin = ""
+                if 'SSIM_erro' in m:
+                    margin = f" — margem de 95%: PSNR ± {m['PSNR_erro']:.2f} dB, SSIM ± {m['SSIM_erro']:.3f}"
+                st.caption(f"📏 PSNR e SSIM estimados no modo {m['modo']}{margin}")
+            
             st.divider()
             
             all_ok = m['psnr_ok'] and m['ssim_ok'] and m['lc_ok'] and m['edge_ok']
@@ -881,38 +1012,16 @@ def main():
             st.divider()
             st.subheader("📊 Gráficos")
             
-            fig, axes = plt.subplots(2, 2, figsize=(12, 10))
-            
-            ax1 = axes[0, 0]
-            ax1.bar(['PSNR'], [m['PSNR']], color='green' if m['psnr_ok'] else 'orange', alpha=0.7)
-            ax1.axhline(y=ImageProcessingSystem.PSNR_THRESHOLD, color='red', linestyle='--')
-            ax1.set_ylabel('dB')
-            ax1.set_title('PSNR', fontweight='bold')
-            ax1.grid(alpha=0.3)
-            
-            ax2 = axes[0, 1]
-            ax2.bar(['SSIM'], [m['SSIM']], color='green' if m['ssim_ok'] else 'orange', alpha=0.7)
-            ax2.axhline(y=ImageProcessingSystem.SSIM_THRESHOLD, color='red', linestyle='--')
-            ax2.set_ylim([0, 1])
-            ax2.set_title('SSIM', fontweight='bold')
-            ax2.grid(alpha=0.3)
-            
-            ax3 = axes[1, 0]
-            ax3.bar(['LC'], [m['LC']], color='green' if m['lc_ok'] else 'orange', alpha=0.7)
-            ax3.axhline(y=ImageProcessingSystem.LC_MIN_THRESHOLD, color='red', linestyle='--')
-            ax3.set_title('Local Contrast', fontweight='bold')
-            ax3.grid(alpha=0.3)
-            
-            ax4 = axes[1, 1]
-            ax4.bar(['Edge'], [m['Edge_Sharpness']], color='green' if m['edge_ok'] else 'orange', alpha=0.7)
-            ax4.axhline(y=ImageProcessingSystem.EDGE_MIN_THRESHOLD, color='red', linestyle='--')
-            ax4.axhline(y=ImageProcessingSystem.EDGE_MAX_THRESHOLD, color='red', linestyle='--')
-            ax4.set_ylim([0, max(0.3, m['Edge_Sharpness'] * 1.2)])
-            ax4.set_title('Edge Sharpness', fontweight='bold')
-            ax4.grid(alpha=0.3)
-            
-            plt.tight_layout()
-            st.pyplot(fig)
+            charts = st.session_state.setdefault('_metric_charts', AnalysisCache())
+            chart_psnr, chart_ssim, chart_lc, chart_edge = charts.get_or_compute((m,), lambda: metric_specs(m))
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                st.vega_lite_chart(chart_psnr, use_container_width=True)
+                st.vega_lite_chart(chart_lc, use_container_width=True)
+            with col2:
+                st.vega_lite_chart(chart_ssim, use_container_width=True)
+                st.vega_lite_chart(chart_edge, use_container_width=True)
     
     # TAB 5: RELATÓRIO
     with tab5:
@@ -929,6 +1038,30 @@ def main():
             else:
                 st.info("Nenhuma operação registrada")
             
+            undo = st.session_state.image_history
+            if len(undo):
+                st.caption(
+                    f"↩️ Undo: {len(undo)} estado(s), {undo.nbytes() / 1024:.0f} KB comprimidos "
+                    f"({undo.raw_nbytes() / 1024:.0f} KB em cópias completas)"
+                )
+            
+            st.subheader("⏱️ Desempenho")
+            performance = st.session_state.performance[:20]
+            if performance:
+                st.dataframe(desempenho.operation_rows(performance), hide_index=True, use_container_width=True)
+                # Rótulos numerados a partir da operação mais antiga: estáveis entre execuções
+                total = len(st.session_state.performance)
+                staged = {f"#{total - i} {t['hora']} — {t['acao']}": t
+                          for i, t in enumerate(performance) if t['etapas']}
+                if staged:
+                    timing = staged[st.selectbox("Etapas da operação", list(staged))]
+                    slowest = max(timing['etapas'], key=lambda r: r['ms'])
+                    st.dataframe(desempenho.stage_rows(timing), hide_index=True, use_container_width=True)
+                    st.caption(f"🐢 Etapa mais lenta: {slowest['etapa']} ({slowest['ms']:.0f} ms "
+                               f"de {timing['ms']:.0f} ms)")
+            else:
+                st.info("Nenhuma operação medida")
+            
             st.divider()
             
             col1, col2 = st.columns(2)
@@ -947,6 +1080,7 @@ def main():
             
             with col2:
                 if st.button("💾 Baixar Imagem", use_container_width=True):
+                    from PIL import Image
                     img_pil = Image.fromarray(st.session_state.processed_image)
                     buf = io.BytesIO()
                     img_pil.save(buf, format='PNG')
@@ -969,7 +1103,8 @@ def main():
                 
                 with col1:
                     st.markdown("**Informações:**")
-                    st.write(f"• Resolução: 512×512 pixels")
+                    h, w = st.session_state.processed_image.shape[:2]
+                    st.write(f"• Resolução: {w}×{h} pixels")
                     st.write(f"• Canais: RGB")
                     st.write(f"• Operações: {len(st.session_state.history)}")
                 
@@ -994,14 +1129,19 @@ def main():
                     st.session_state.preview_image = None
                     st.session_state.versions = {}
                     st.session_state.history = []
+                    st.session_state.performance = []
                     st.session_state.metrics = {}
-                    st.session_state.image_history = []
+                    st.session_state.image_history.clear()
+                    ImageProcessingSystem.jobs().cancel()
+                    if st.session_state.image_store is not None:
+                        st.session_state.image_store.clear()
                     st.success("✅ Resetado!")
                     st.rerun()
             
             with col2:
                 if st.button("📋 Limpar Histórico", use_container_width=True):
                     st.session_state.history = []
+                    st.session_state.performance = []
                     st.success("✅ Limpo!")
                     st.rerun()
     
@@ -1093,7 +1233,6 @@ def main():
                 st.divider()
                 
                 if st.button("⚡ Executar Pipeline", type="primary", use_container_width=True):
-                    ImageProcessingSystem.save_state()
                     ImageProcessingSystem.apply_hybrid_processing(
                         use_smoothing, hybrid_sigma,
                         use_clahe, hybrid_clip, hybrid_tile,
@@ -1104,14 +1243,14 @@ def main():
                 st.subheader("📺 Resultado")
                 
                 if st.session_state.processed_image is not None:
-                    st.image(st.session_state.processed_image, caption="Resultado Final", use_container_width=True)
+                    ImageProcessingSystem.show_image(ImageProcessingSystem.display_image(st.session_state.processed_image), "Resultado Final", 0.5)
                     
                     with st.expander("🔍 Comparar"):
                         col1, col2 = st.columns(2)
                         with col1:
-                            st.image(st.session_state.normalized_image, caption="Original", use_container_width=True)
+                            ImageProcessingSystem.show_image(ImageProcessingSystem.display_image(st.session_state.normalized_image), "Original", 0.25)
                         with col2:
-                            st.image(st.session_state.processed_image, caption="Híbrido", use_container_width=True)
+                            ImageProcessingSystem.show_image(ImageProcessingSystem.display_image(st.session_state.processed_image), "Híbrido", 0.25)
                 else:
                     st.info("👆 Configure e execute o pipeline")
                 
@@ -1148,6 +1287,11 @@ def main():
         <p>Python • OpenCV • scikit-image • Streamlit</p>
     </div>
     """, unsafe_allow_html=True)
+    
+    # Verificação periódica enquanto houver tarefas em segundo plano
+    if ImageProcessingSystem.jobs().pending():
+        with st.sidebar:
+            job_watcher()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
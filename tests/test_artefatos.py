@@ -0,0 +1,63 @@
+"""
+Testes do cache de artefatos (artefatos.py)
+
+Execução (na raiz do projeto):
+python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import artefatos
+import processamento as proc
+
+
+def _image(seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, size=(64, 64, 3), dtype=np.uint8)
+
+
+def test_sharpen_sees_in_place_edit():
+    img = _image()
+    proc.sharpen(img, 'Laplaciano', 0.5, 30, 1.0)
+    proc.sharpen(img, 'Sobel', 0.5, 30, 1.0)
+    img[:] = 0
+    for method in ('Laplaciano', 'Sobel'):
+        assert not proc.sharpen(img, method, 0.5, 30, 1.0).any()
+
+
+def test_metrics_see_in_place_edit():
+    original = _image(1)
+    processed = _image(2)
+    assert proc.compute_metrics(original, processed)['Edge_Sharpness'] > 0
+    processed[:] = 0
+    assert proc.compute_metrics(original, processed)['Edge_Sharpness'] == 0.0
+
+
+def test_frozen_image_is_cached():
+    img = artefatos.freeze(_image(3))
+    edges = artefatos.canny(img)
+    assert artefatos.canny(img) is edges
+    assert not edges.flags.writeable
+
+
+def test_view_of_writable_array_is_not_cached():
+    base = _image(4)
+    view = artefatos.freeze(base[:32])
+    edges = artefatos.canny(view)
+    base[:] = 0
+    assert artefatos.canny(view) is not edges
+    assert not artefatos.canny(view).any()
+
+
+def test_content_hash_sees_in_place_edit():
+    from cache import content_hash
+
+    img = _image(5)
+    before = content_hash(img)
+    img[0, 0] ^= 1
+    assert content_hash(img) != before
@@ -0,0 +1,39 @@
+"""
+Testes dos backends da suavização gaussiana (processamento.gaussian_blur)
+
+Execução (na raiz do projeto):
+python -m pytest tests
+"""
+
+import glob
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import processamento as proc
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'imagens')
+
+
+def _images():
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 256, size=(128, 128, 3), dtype=np.uint8)]
+    for path in sorted(glob.glob(os.path.join(IMAGES_DIR, '*.jpg')))[:1]:
+        with open(path, 'rb') as f:
+            images.append(proc.normalize_image(proc.decode_image(f.read())))
+    return images
+
+
+@pytest.mark.parametrize('backend', sorted(proc.GAUSSIAN_TOLERANCES))
+@pytest.mark.parametrize('sigma', [0.3, 0.5, 1.0, 2.0])
+def test_gaussian_backend_within_documented_tolerance(backend, sigma):
+    max_diff, max_fraction = proc.gaussian_tolerance(backend, sigma)
+    for img in _images():
+        reference = proc.gaussian_blur(img, sigma, backend='skimage')
+        diff = np.abs(proc.gaussian_blur(img, sigma, backend=backend).astype(np.int16) - reference)
+        assert diff.max() <= max_diff
+        assert np.count_nonzero(diff) / diff.size <= max_fraction